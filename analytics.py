@@ -0,0 +1,116 @@
+import datetime
+
+import pytz
+
+# Completion-rate windows, in periods (days for daily streaks, weeks for weekly)
+WINDOWS = (7, 30, 365)
+HISTORY_BITS = 365
+HISTORY_MASK = (1 << HISTORY_BITS) - 1
+HISTORY_BYTES = (HISTORY_BITS + 7) // 8
+
+# Field order of the stats tuple the rollover engine works with
+FIELDS = ("history", "longest", "done-7", "done-30", "done-365", "days")
+EMPTY = (0, 0, 0, 0, 0, 0)
+
+
+# ------------INCREMENTAL UPDATE------------
+def advance(stats, completed, daily):
+    """Fold one closed period into the rolling stats, without looking at older history.
+
+    ``history`` is a bitmask with bit 0 for the period just closed. Each
+    window count gains the new period and loses the one sliding out of it.
+    """
+    # Unrolled over WINDOWS: this runs once per streak at every rollover.
+    history, longest, done_7, done_30, done_365, days = stats
+    completed = int(completed)
+    if completed and daily > longest:
+        longest = daily
+    return (((history << 1) | completed) & HISTORY_MASK,
+            longest,
+            done_7 + completed - ((history >> 6) & 1),
+            done_30 + completed - ((history >> 29) & 1),
+            done_365 + completed - ((history >> 364) & 1),
+            min(days + 1, HISTORY_BITS))
+
+
+def stats_of(details):
+    return tuple(details.get(field, 0) for field in FIELDS)
+
+
+def store_stats(details, stats):
+    details.update(zip(FIELDS, stats))
+
+
+def history_to_blob(history):
+    return history.to_bytes(HISTORY_BYTES, "little")
+
+
+def history_from_blob(blob):
+    return int.from_bytes(blob, "little") if blob else 0
+
+
+# ------------QUERIES------------
+def completion_rate(details, window):
+    tracked = min(details.get("days", 0), window)
+    if not tracked:
+        return None
+    return details.get(f"done-{window}", 0) / tracked
+
+
+def history_message(activity, details, kind="daily"):
+    unit = "days" if kind == "daily" else "weeks"
+    lines = [f"{str(activity).upper()}",
+             f"Current streak: {details['daily']} {unit}",
+             f"Longest streak: {max(details.get('longest', 0), details['daily'])} {unit}"]
+    for window in WINDOWS:
+        rate = completion_rate(details, window)
+        shown = "-" if rate is None else f"{rate:.0%}"
+        lines.append(f"Last {window} {unit}: {shown}")
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+def last_closed_day(closed, timezone, hour, minute):
+    """Local date of the day held in bit 0 of a daily history.
+
+    ``closed`` is the period (the local date of the rollover) the profile
+    last closed, which covers the day before it. Profiles that have not
+    recorded one yet fall back to the latest rollover time on the local clock.
+    """
+    if closed:
+        return datetime.date.fromisoformat(closed) - datetime.timedelta(days=1)
+    now = datetime.datetime.now(pytz.timezone(timezone))
+    rolled_today = (now.hour, now.minute) >= (hour, minute)
+    return now.date() - datetime.timedelta(days=1 if rolled_today else 2)
+
+
+def heatmap_message(activity, details, last_day, weeks=12):
+    """Calendar of the last ``weeks`` weeks for a daily streak, one row per weekday.
+
+    ``last_day`` is the local date of the most recently closed day (bit 0).
+    """
+    history = details.get("history", 0)
+    days = details.get("days", 0)
+    # Bit i is the day i days before last_day; the last column is today's week
+    today = last_day + datetime.timedelta(days=1)
+    last_monday = today - datetime.timedelta(days=today.weekday())
+    start = last_monday - datetime.timedelta(weeks=weeks - 1)
+    rows = []
+    for weekday in range(7):
+        cells = []
+        for week in range(weeks):
+            day = start + datetime.timedelta(weeks=week, days=weekday)
+            ago = (today - day).days - 1
+            if ago < 0 or ago >= days:
+                cells.append("·")
+            else:
+                cells.append("█" if (history >> ago) & 1 else "░")
+        rows.append(f"{'MTWTFSS'[weekday]} {''.join(cells)}")
+    return f"```\n{str(activity).upper()} - last {weeks} weeks\n" + "\n".join(rows) + "\n█ done  ░ missed  · untracked```"
+
+
+def strip_message(activity, details, periods=52):
+    """One-line history for weekly streaks, oldest on the left."""
+    history = details.get("history", 0)
+    days = min(details.get("days", 0), periods)
+    cells = "".join("█" if (history >> ago) & 1 else "░" for ago in reversed(range(days)))
+    return f"```\n{str(activity).upper()} - last {days} weeks\n{cells or '(no history yet)'}```"
@@ -0,0 +1,26 @@
+import os
+import tempfile
+
+
+# ------------ATOMIC FILE WRITE------------
+def atomic_write(path, text):
+    # Write next to the target so the rename stays on the same filesystem,
+    # then swap it in. A crash leaves either the old file or the new one.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".streaks-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import contextlib
+import datetime
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+DAILY_CHANNEL = 101
+WEEKLY_CHANNEL = 102
+COMMAND_MIX = (("done", 0.55), ("left", 0.2), ("summary", 0.2), ("add", 0.05))
+# A store rollover over --rollover-profiles profiles should finish within this
+ROLLOVER_TARGET = 1.0
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay commands against the bot with a fake Discord.")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--users", type=int, default=50, help="profiles to spread commands over (sqlite only)")
+    parser.add_argument("--streaks", type=int, default=5, help="streaks per profile")
+    parser.add_argument("--commands", type=int, default=5000)
+    parser.add_argument("--rollovers", type=int, default=3)
+    parser.add_argument("--rest-latency", type=float, default=0.0, help="seconds added to every fake REST call")
+    parser.add_argument("--pace", action="store_true", help="keep Discord's per-channel send pacing")
+    parser.add_argument("--rollover-profiles", type=int, default=0,
+                        help="also time a bare store rollover over this many profiles (sqlite only)")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def configure(args, workdir):
+    # main reads its configuration at import time
+    os.environ.setdefault("ALLOWED_CHANNEL_ID_DAILY", str(DAILY_CHANNEL))
+    os.environ.setdefault("ALLOWED_CHANNEL_ID_WEEKLY", str(WEEKLY_CHANNEL))
+    os.environ["FLUSH_DELAY"] = os.getenv("FLUSH_DELAY", "0.05")
+    os.environ["MESSAGES_FILE"] = os.path.join(workdir, "messages.json")
+    if args.backend == "sqlite":
+        os.environ["STREAKS_DB"] = os.path.join(workdir, "streaks.db")
+    else:
+        os.environ.pop("STREAKS_DB", None)
+        path = os.path.join(workdir, "streaks.json")
+        with open(path, "w") as file:
+            json.dump({"daily-streaks": {}, "master-count": 0, "freeze": 0, "weekly-streaks": {}}, file)
+        os.environ["STREAKS_JSON"] = path
+
+
+async def run(args):
+    # Keep the handlers' debug prints out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        return await replay(args)
+
+
+async def replay(args):
+    import main
+    from fake_discord import FakeDiscord
+    from outbox import Outbox
+
+    rng = random.Random(args.seed)
+    main.store.load()
+    if not args.pace:
+        # The fake REST layer has no rate limits to respect
+        main.outbox = Outbox(capacity=float("inf"))
+    discord_ = FakeDiscord(main.bot, main.on_message, rest_latency=args.rest_latency)
+    await discord_.connect()
+    channel_id = main.ALLOWED_CHANNEL_ID_DAILY
+    users = [discord_.user(2000 + n) for n in range(args.users if args.backend == "sqlite" else 1)]
+    names = [f"streak-{n}" for n in range(args.streaks)]
+
+    for user in users:
+        await discord_.message(channel_id, user, f"!add {' '.join(names)}")
+    await main.store.flush()
+
+    latencies = {}
+    writes_before = main.store.writes
+    rest_before = discord_.rest.total
+    commands_, weights = zip(*COMMAND_MIX)
+    started = time.perf_counter()
+    for _ in range(args.commands):
+        user = rng.choice(users)
+        command = rng.choices(commands_, weights)[0]
+        if command == "done":
+            content = f"!done {rng.choice(names)}"
+        elif command == "add":
+            content = f"!add extra-{rng.randrange(args.streaks)}"
+        else:
+            content = f"!{command}"
+        tick = time.perf_counter()
+        await discord_.message(channel_id, user, content)
+        latencies.setdefault(command, []).append(time.perf_counter() - tick)
+    elapsed = time.perf_counter() - started
+    await main.store.flush()
+    writes = main.store.writes - writes_before
+    rest_calls = discord_.rest.total - rest_before
+
+    rollover_times = []
+    start = datetime.datetime.now(datetime.timezone.utc)
+    for day in range(args.rollovers):
+        # One rollover per simulated day, each closing a new period
+        due = start + datetime.timedelta(days=day)
+        for timezone in await main.store.timezones():
+            tick = time.perf_counter()
+            await main.daily_rollover_job(timezone)(due)
+            await main.morning_summary_job(timezone)(due)
+            rollover_times.append(time.perf_counter() - tick)
+
+    main.store.save()
+
+    lines = [f"backend={args.backend} profiles={len(users)} streaks/profile={args.streaks} commands={args.commands}",
+             f"{'command':<10}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}"]
+    every = [sample for samples in latencies.values() for sample in samples]
+    for command, samples in sorted(latencies.items()) + [("all", every)]:
+        lines.append(f"{command:<10}{len(samples):>8}"
+                     f"{percentile(samples, 0.5) * 1000:>10.3f}{percentile(samples, 0.99) * 1000:>10.3f}")
+    lines.append(f"throughput: {args.commands / elapsed:.0f} commands/s")
+    lines.append(f"disk writes: {writes} ({writes / args.commands:.4f} per command)")
+    lines.append(f"REST calls: {rest_calls} ({rest_calls / args.commands:.2f} per command)")
+    if rollover_times:
+        lines.append(f"rollover + morning report: mean {statistics.mean(rollover_times) * 1000:.1f} ms "
+                     f"over {len(rollover_times)} runs")
+    lines.append(f"REST calls by route: {discord_.rest.calls}")
+    if args.backend == "sqlite" and args.rollover_profiles:
+        lines.append(await time_store_rollover(args, rng, os.path.dirname(os.environ["STREAKS_DB"])))
+    return lines
+
+
+async def time_store_rollover(args, rng, workdir):
+    """Roll over a store seeded with ``--rollover-profiles`` half-finished profiles."""
+    import analytics
+    from sqlite_store import SqliteStreakStore
+
+    store = SqliteStreakStore(os.path.join(workdir, "rollover.db"))
+    store.load()
+
+    def seed(conn):
+        conn.executemany("INSERT INTO profiles (guild_id, user_id, freeze) VALUES (1, ?, ?)",
+                         [(user, rng.randint(0, 2)) for user in range(args.rollover_profiles)])
+        conn.executemany(
+            "INSERT INTO streaks (guild_id, user_id, kind, name, daily, aim, history, days) "
+            "VALUES (1, ?, 'daily', ?, ?, 4, ?, 40)",
+            [(user, f"streak-{n}", rng.choice((3, 4)), analytics.history_to_blob(rng.getrandbits(40)))
+             for user in range(args.rollover_profiles) for n in range(args.streaks)])
+
+    await store._run(store._write, seed)
+    tick = time.perf_counter()
+    await store.roll_over(rng, period=datetime.date.today().isoformat())
+    elapsed = time.perf_counter() - tick
+    store.save()
+    verdict = "ok" if elapsed < ROLLOVER_TARGET else "over target"
+    return (f"store rollover: {elapsed * 1000:.1f} ms for {args.rollover_profiles} profiles "
+            f"x {args.streaks} streaks ({verdict}, target {ROLLOVER_TARGET * 1000:.0f} ms)")
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        configure(arguments, directory)
+        print("\n".join(asyncio.run(run(arguments))))
@@ -0,0 +1,185 @@
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+
+import discord
+from discord.ext import commands
+
+DISCORD_EPOCH_MS = 1420070400000
+_sequence = itertools.count()
+
+
+def snowflake():
+    # Real layout (timestamp << 22) so created_at and bulk-delete windows work
+    return ((int(time.time() * 1000) - DISCORD_EPOCH_MS) << 22) | (next(_sequence) & 0x3FFFFF)
+
+
+# ------------FAKE GATEWAY OBJECTS------------
+class FakeGuild:
+    def __init__(self, guild_id, name="guild"):
+        self.id = guild_id
+        self.name = name
+
+
+class FakeUser:
+    def __init__(self, user_id, name="user", bot=False):
+        self.id = user_id
+        self.name = name
+        self.bot = bot
+        self.mention = f"<@{user_id}>"
+
+    def __eq__(self, other):
+        return isinstance(other, FakeUser) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeMessage:
+    def __init__(self, channel, author, content, message_id=None):
+        self.id = message_id or snowflake()
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.attachments = []
+        self.mentions = []
+        self.created_at = discord.utils.snowflake_time(self.id)
+        self._state = None
+
+    async def delete(self, *, delay=None):
+        await self.channel.rest.call("delete_message")
+        self.channel.remove(self.id)
+
+
+class FakeREST:
+    """Counts REST calls per route and optionally adds a fixed round-trip delay."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+
+    async def call(self, route):
+        self.calls[route] = self.calls.get(route, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    @property
+    def total(self):
+        return sum(self.calls.values())
+
+
+class FakeChannel:
+    type = discord.ChannelType.text
+
+    def __init__(self, channel_id, guild, rest, bot_user):
+        self.id = channel_id
+        self.guild = guild
+        self.rest = rest
+        self.bot_user = bot_user
+        self.mention = f"<#{channel_id}>"
+        self.history = {}
+        # Called with every message the bot sends, as the gateway echoes them back
+        self.echo = None
+
+    def __eq__(self, other):
+        return isinstance(other, FakeChannel) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def permissions_for(self, member):
+        return discord.Permissions.all()
+
+    def remove(self, message_id):
+        self.history.pop(message_id, None)
+
+    async def send(self, content=None, **kwargs):
+        await self.rest.call("send_message")
+        message = FakeMessage(self, self.bot_user, content)
+        self.history[message.id] = message
+        if self.echo is not None:
+            await self.echo(message)
+        return message
+
+    async def purge(self, *, limit=100, **kwargs):
+        # History is fetched 100 at a time before anything is deleted
+        for _ in range(max(1, -(-min(limit, len(self.history)) // 100))):
+            await self.rest.call("get_history")
+        doomed = sorted(self.history, reverse=True)[:limit]
+        await self.delete_messages([discord.Object(message_id) for message_id in doomed])
+        return doomed
+
+    async def delete_messages(self, messages, **kwargs):
+        messages = list(messages)
+        if not messages:
+            return
+        await self.rest.call("bulk_delete" if len(messages) > 1 else "delete_message")
+        for message in messages:
+            self.remove(message.id)
+
+    def get_partial_message(self, message_id):
+        return self.history.get(message_id) or FakeMessage(self, self.bot_user, None, message_id)
+
+
+class FakeContext(commands.Context):
+    """Context whose replies go straight to the fake channel instead of the HTTP client."""
+
+    async def send(self, content=None, **kwargs):
+        kwargs.pop("delete_after", None)
+        return await self.channel.send(content, **kwargs)
+
+
+# ------------HARNESS------------
+class FakeDiscord:
+    """Stands in for the gateway and REST layer around a ``commands.Bot``.
+
+    Messages built with :meth:`message` are fed through the bot's own
+    ``on_message`` handler, so prefix parsing, checks and command handlers run
+    exactly as they do live; only the network is replaced.
+    """
+
+    def __init__(self, bot, on_message, rest_latency=0.0, guild_id=1, owner_id=1000):
+        self.bot = bot
+        self.on_message = on_message
+        self.rest = FakeREST(rest_latency)
+        self.guild = FakeGuild(guild_id)
+        self.bot_user = FakeUser(999, "streaks-bot", bot=True)
+        self.owner = FakeUser(owner_id, "owner")
+        self.channels = {}
+
+        original_get_context = bot.get_context
+
+        async def get_context(origin, *, cls=FakeContext):
+            return await original_get_context(origin, cls=cls)
+
+        async def application_info():
+            await self.rest.call("application_info")
+            return SimpleNamespace(owner=self.owner)
+
+        bot._connection.user = self.bot_user
+        bot.get_context = get_context
+        bot.get_channel = self.channels.get
+        bot.application_info = application_info
+
+    async def connect(self):
+        """Bind the bot to the running loop, as logging in would."""
+        await self.bot._async_setup_hook()
+        self.bot._ready.set()
+
+    def channel(self, channel_id):
+        if channel_id not in self.channels:
+            self.channels[channel_id] = FakeChannel(channel_id, self.guild, self.rest, self.bot_user)
+            self.channels[channel_id].echo = self.on_message
+        return self.channels[channel_id]
+
+    def user(self, user_id):
+        return FakeUser(user_id, f"user-{user_id}")
+
+    async def message(self, channel_id, author, content):
+        """Deliver one gateway MESSAGE_CREATE and wait for the handler to finish."""
+        message = FakeMessage(self.channel(channel_id), author, content)
+        message.channel.history[message.id] = message
+        await self.on_message(message)
+        return message
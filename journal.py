@@ -0,0 +1,162 @@
+import argparse
+import datetime
+import json
+import os
+
+import analytics
+
+
+# ------------EVENTS------------
+def apply_event(state, event):
+    """Apply one journal event to a streaks.json-shaped dict, in place.
+
+    The live store applies every mutation through here too, so replaying a
+    journal always lands on the same state the bot had in memory.
+    """
+    kind = event.get("kind")
+    streaks = state[f"{kind}-streaks"] if kind else None
+    type_ = event["type"]
+    if type_ == "done":
+        streaks[event["name"]]["daily"] += 1
+    elif type_ == "add":
+        streaks[event["name"]] = {"daily": 0, "aim": 1}
+    elif type_ == "remove":
+        del streaks[event["name"]]
+    elif type_ == "reset":
+        streaks[event["name"]].update(daily=0, aim=1)
+    elif type_ == "rollover":
+        # Completed streaks move on to the next aim, missed ones were either
+        # reset by their own events or held by a freeze.
+        for details in streaks.values():
+            completed = details["daily"] == details["aim"]
+            analytics.store_stats(details, analytics.advance(analytics.stats_of(details), completed, details["daily"]))
+            if completed:
+                details["aim"] += 1
+        if event.get("period"):
+            state.setdefault("closed", {})[kind] = event["period"]
+    elif type_ == "group":
+        groups = state.setdefault(f"{kind}-groups", {})
+        if event["members"]:
+            groups[event["name"]] = event["members"]
+        else:
+            groups.pop(event["name"], None)
+    elif type_ == "batch":
+        for sub_event in event["events"]:
+            apply_event(state, sub_event)
+    elif type_ == "freeze-earned":
+        state["freeze"] += event["amount"]
+    elif type_ == "freeze-spent":
+        state["freeze"] -= event["amount"]
+    elif type_ == "timezone":
+        state["timezone"] = event["timezone"]
+    elif type_ == "schedule-run":
+        state.setdefault("schedule", {})[event["job"]] = event["when"]
+    else:
+        raise ValueError(f"Unknown journal event {type_!r}")
+    state["master-count"] = len(state["daily-streaks"])
+
+
+def read_events(path):
+    """Yield the events in a journal file; a torn final line from a crash is skipped."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as file:
+        for line in file:
+            if not line.endswith("\n"):
+                break
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                break
+
+
+def replay(state, paths, after_seq=0, until=None):
+    """Apply events newer than ``after_seq`` (and not after ``until``) from ``paths`` in order."""
+    seq = after_seq
+    for path in paths:
+        for event in read_events(path):
+            if event["seq"] <= seq:
+                continue
+            if until is not None and event["ts"] > until:
+                return seq
+            apply_event(state, event)
+            seq = event["seq"]
+    return seq
+
+
+# ------------JOURNAL FILE------------
+class Journal:
+    """Line-oriented, append-only log of streak events.
+
+    Events are numbered and buffered in memory by :meth:`append`; the owner
+    hands :meth:`take_pending` to :meth:`write_lines` (on a worker thread) to
+    append and fsync them in one go.
+    """
+
+    def __init__(self, path, archive=True):
+        self.path = path
+        self.archive = archive
+        self.seq = 0
+        self.size = 0
+        self._pending = []
+
+    def append(self, event):
+        self.seq += 1
+        event = {"seq": self.seq, "ts": datetime.datetime.now(datetime.timezone.utc).isoformat(), **event}
+        self._pending.append(json.dumps(event) + "\n")
+        self.size += 1
+        return event
+
+    def repair(self):
+        """Cut off a torn final line so new appends start on a clean line."""
+        if not os.path.exists(self.path):
+            return
+        valid = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                valid += len(line)
+            if file.seek(0, os.SEEK_END) == valid:
+                return
+        with open(self.path, "r+b") as file:
+            file.truncate(valid)
+            os.fsync(file.fileno())
+
+    def take_pending(self):
+        lines, self._pending = self._pending, []
+        return lines
+
+    def write_lines(self, lines):
+        with open(self.path, "a") as file:
+            file.writelines(lines)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def rotate(self, snapshot_seq):
+        # Called once a snapshot covering ``snapshot_seq`` is safely on disk.
+        # Archived segments keep the audit trail; anything still pending is
+        # written to the fresh file and skipped on replay by its seq.
+        if os.path.exists(self.path):
+            if self.archive:
+                os.replace(self.path, f"{self.path}.{snapshot_seq}")
+            else:
+                os.remove(self.path)
+        self.size = self.seq - snapshot_seq
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild streaks.json state as of a point in time.")
+    parser.add_argument("snapshot", help="a streaks.json snapshot")
+    parser.add_argument("journals", nargs="+", help="journal segments, oldest first")
+    parser.add_argument("--until", help="ISO timestamp (UTC) of the last event to apply")
+    args = parser.parse_args()
+    with open(args.snapshot, "r") as snapshot_file:
+        restored = json.load(snapshot_file)
+    last_seq = replay(restored, args.journals, restored.pop("journal-seq", 0), args.until)
+    restored["journal-seq"] = last_seq
+    print(json.dumps(restored, indent=4))
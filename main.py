@@ -1,4 +1,3 @@
-import json
 import random
 from typing import Final
 import os
@@ -9,14 +8,17 @@ from discord.ext import commands
 
 import re
 import asyncio
-import datetime
+import time
 import pytz
 
-# Define bot command prefix
-intents = discord.Intents.default()
-intents.messages = True  # Enable message events
-intents.message_content = True  # Required to read message content
-bot = commands.Bot(command_prefix="!", intents=intents)
+from store import StreakStore, DONE_UPDATED, DONE_MISSING, DAILY, WEEKLY, DEFAULT_TIMEZONE
+from sqlite_store import SqliteStreakStore
+from scheduler import Scheduler, Recurrence
+from outbox import Outbox, compose
+from render_cache import RenderCache
+from message_index import MessageIndex
+from metrics import registry, watch_loop_lag, dump_periodically, stats_report
+import analytics
 
 # ------------LOAD OUR TOKEN, ID AND FILES FROM SOMEWHERE ELSE------------
 load_dotenv()
@@ -25,221 +27,361 @@ EXTINGUISH: Final[str] = os.getenv('EXTINGUISH')
 FIRED_UP: Final[str] = os.getenv('FIRED_UP')
 STILL_ALIVE: Final[str] = os.getenv('STILL_ALIVE')
 
-ALLOWED_CHANNEL_ID_DAILY = int(os.getenv('ALLOWED_CHANNEL_ID_DAILY'))
-ALLOWED_CHANNEL_ID_WEEKLY = int(os.getenv('ALLOWED_CHANNEL_ID_WEEKLY'))
-JSON_FILE = "streaks.json"
+ALLOWED_CHANNEL_ID_DAILY = int(os.getenv('ALLOWED_CHANNEL_ID_DAILY', '0'))
+ALLOWED_CHANNEL_ID_WEEKLY = int(os.getenv('ALLOWED_CHANNEL_ID_WEEKLY', '0'))
+# Per-guild channels as "guild:daily:weekly,guild:daily:weekly"; guilds not
+# listed use the two channels above
+STREAK_CHANNELS = os.getenv('STREAK_CHANNELS', '')
+# Register the commands as slash commands too, so the message_content intent can be off
+SLASH_COMMANDS = os.getenv('SLASH_COMMANDS', '') not in ('', '0')
+JSON_FILE = os.getenv('STREAKS_JSON', "streaks.json")
+FLUSH_DELAY = float(os.getenv('FLUSH_DELAY', '2'))
+# Set STREAKS_DB to a SQLite path to track streaks per guild and user
+STREAKS_DB = os.getenv('STREAKS_DB')
+# Local wall-clock times (HH:MM) in each user's time zone
+ROLLOVER_TIME = os.getenv('ROLLOVER_TIME', '07:47')
+MORNING_TIME = os.getenv('MORNING_TIME', ROLLOVER_TIME)
+WEEKLY_DAY = int(os.getenv('WEEKLY_DAY', '0'))  # 0 = Monday
+METRICS_FILE = os.getenv('METRICS_FILE', 'metrics.json')
+METRICS_INTERVAL = float(os.getenv('METRICS_INTERVAL', '60'))
+# Bot and command message IDs kept for cleanup, per channel
+MESSAGES_FILE = os.getenv('MESSAGES_FILE', 'messages.json')
+
+# ------------ALLOWED CHANNELS------------
+def parse_channels(spec):
+    guild_channels = {None: {DAILY: ALLOWED_CHANNEL_ID_DAILY, WEEKLY: ALLOWED_CHANNEL_ID_WEEKLY}}
+    for entry in filter(None, spec.split(",")):
+        guild_id, daily_id, weekly_id = entry.split(":")
+        guild_channels[int(guild_id)] = {DAILY: int(daily_id or 0), WEEKLY: int(weekly_id or 0)}
+    return guild_channels
+
+
+# {guild_id: {kind: channel_id}}, plus the defaults under None
+GUILD_CHANNELS = parse_channels(STREAK_CHANNELS)
+# Channel IDs are unique across guilds, so one lookup gives the kind
+CHANNEL_KINDS = {channel_id: kind for channels in GUILD_CHANNELS.values()
+                 for kind, channel_id in channels.items() if channel_id}
+ALLOWED_CHANNELS = frozenset(CHANNEL_KINDS)
+PREFIX = "!"
+
+# Define bot command prefix
+intents = discord.Intents.default()
+intents.messages = True  # Enable message events
+intents.message_content = not SLASH_COMMANDS  # Required to read prefix commands
+bot = commands.Bot(command_prefix=PREFIX, intents=intents)
+
+if STREAKS_DB:
+    store = SqliteStreakStore(STREAKS_DB)
+else:
+    store = StreakStore(JSON_FILE, flush_delay=FLUSH_DELAY)
+
+
+scheduler = None
+outbox = Outbox()
+renders = RenderCache(store)
+messages = MessageIndex(MESSAGES_FILE)
+# Rollover reports per time zone, waiting for that zone's morning message
+pending_reports = {}
+
+
+def profile_key(ctx):
+    return (ctx.guild.id if ctx.guild else 0), ctx.author.id
+
+
+def streak_kind(ctx):
+    return CHANNEL_KINDS.get(ctx.channel.id)
+
+
+def streak_channel(guild_id, kind):
+    channels = GUILD_CHANNELS.get(guild_id, GUILD_CHANNELS[None])
+    return bot.get_channel(channels[kind])
+
+
+async def daily_only(ctx):
+    # Always answer: an unanswered slash command shows "The application did not respond"
+    await ctx.send("This command only works in the daily streaks channel.", ephemeral=True)
+
+
+def streak_command(description):
+    # A prefix command, registered as a slash command too in SLASH_COMMANDS mode
+    return bot.hybrid_command(with_app_command=SLASH_COMMANDS, description=description)
 
 
 # ------------HANDLING THE STARTUP FOR OUR BOT AND CLIENT EVENT------------
 @bot.event
 async def on_ready():
+    global scheduler
     print(f"Logged in as {bot.user}")
-    await bot.loop.create_task(send_scheduled_message())
+    # on_ready fires again after reconnects, only ever start one scheduler
+    if scheduler is None:
+        scheduler = Scheduler(await store.last_runs(), on_run=store.record_run)
+        await schedule_jobs()
+        bot.loop.create_task(scheduler.run())
+        bot.loop.create_task(watch_loop_lag())
+        bot.loop.create_task(dump_periodically(METRICS_FILE, METRICS_INTERVAL))
+        if SLASH_COMMANDS:
+            await bot.tree.sync()
 
 
 @bot.event
 async def on_error(event, *args, **kwargs):
+    registry.count(f"errors.{event}")
     print(f"An error occurred: {event}")
 
 
-# ------------JSON FILE FUNCTIONS------------
-def load_json():
-    with open(JSON_FILE, "r") as file:
-        return json.load(file)
+class NotStreakChannel(commands.CheckFailure):
+    """Raised by the global check for commands used outside the streak channels."""
 
 
-def save_json(jsonfile):
-    with open(JSON_FILE, "w") as file:
-        json.dump(jsonfile, file, indent=4)
+@bot.event
+async def on_command_error(ctx, error):
+    # Slash commands reach every channel; say why instead of leaving the interaction hanging
+    if ctx.interaction is not None:
+        if isinstance(error, NotStreakChannel):
+            await ctx.send("Streak commands only work in the streak channels.", ephemeral=True)
+            return
+        if isinstance(error, commands.MissingPermissions):
+            await ctx.send("You don't have permission to use this command.", ephemeral=True)
+            return
+    await commands.Bot.on_command_error(bot, ctx, error)
 
 
-# Function to update multiple entries
-def update_json(data, category):
-    if category in data["daily-streaks"]:
-        data["daily-streaks"][category]["count"] += 1
-        save_json(data)
-        print("✅ JSON updated successfully!")
-    else:
-        print(f"❌Streak name {category} does not exist!")
+@bot.check
+async def in_streak_channel(ctx):
+    if ctx.channel.id not in ALLOWED_CHANNELS:
+        raise NotStreakChannel()
+    return True
+
+
+# ------------COMMAND TIMING------------
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+
+@bot.after_invoke
+async def stop_command_timer(ctx):
+    registry.observe(f"command.{ctx.command.name}", time.perf_counter() - ctx.started_at)
+    if ctx.command_failed:
+        registry.count(f"command_errors.{ctx.command.name}")
 
 
 # --------STREAK FREEZE HANDLER--------
-def streak_freeze():
+async def streak_freeze(guild_id, user_id):
     index = random.Random().random() * 100
-    streaks = load_json()
     if index > 70:
-        streaks["freeze"] += 1
-        save_json(streaks)
+        await store.add_freeze(guild_id, user_id)
         return "Keep it up, here is a streak for ya!!"
 
 
 # ---------------MESSAGE---------------
-def summary_message():
-    message = load_json()
-    summary_output = "```"
-    summary_streaks = message.get("daily-streaks", {})
-    for activity, info in summary_streaks.items():
-        summary_output += f"\nStreaks:{info['daily']} - - - - Completed: {info['daily'] == info['aim']} - - - - {str(activity).upper()} "
-    summary_output += "```"
-    return summary_output
-
-
-def summary_message_morning():
-    message = load_json()
-    count = 0
-    summary_output = "```"
-    summary_output += "\nYesterday you completed:\n"
-    summary_output += "--------------------------------------------\n"
-    summary_streaks = message.get("daily-streaks", {})
-    for activity, info in summary_streaks.items():
-        if info['daily'] == info['aim']:
-            summary_output += f"{str(activity).upper()}\n"
-            count += 1
-    if count == 0:
-        summary_output += "...nothing...\n"
-        summary_output += "--------------------------------------------\n"
-        summary_output += "Don't give up!!!\n"
+def summary_message(streaks, kind=DAILY):
+    summary_streaks = streaks.get(f"{kind}-streaks", {})
+    lines = [f"Streaks:{info['daily']} - - - - Completed: {info['daily'] == info['aim']} - - - - {str(activity).upper()} "
+             for activity, info in summary_streaks.items()]
+    return "```" + "".join(f"\n{line}" for line in lines) + "```"
+
+
+def summary_message_morning(completed):
+    lines = ["", "Yesterday you completed:", "--------------------------------------------"]
+    lines.extend(str(activity).upper() for activity in completed)
+    if not completed:
+        lines.append("...nothing...")
+        lines.append("--------------------------------------------")
+        lines.append("Don't give up!!!")
     else:
-        summary_output += "--------------------------------------------\n"
-        summary_output += "Keep it up!!!\n"
-    summary_output += "```"
-    return summary_output
+        lines.append("--------------------------------------------")
+        lines.append("Keep it up!!!")
+    return "```" + "\n".join(lines) + "\n```"
 
 
-def left_message():
-    message = load_json()
-    left_output = "```"
-    left_streaks = message.get("daily-streaks", {})
-    for activity, info in left_streaks.items():
-        if int(info['daily']) != int(info['aim']):
-            left_output += f"\n>> {activity}"
-    left_output += "```"
-    return left_output
+def left_message(streaks, kind=DAILY):
+    left_streaks = streaks.get(f"{kind}-streaks", {})
+    lines = [f"\n>> {activity}" for activity, info in left_streaks.items()
+             if int(info['daily']) != int(info['aim'])]
+    return "```" + "".join(lines) + "```"
 
 
 # ------------------------------------EVENT FUNCTIONS-----------------------------------
 @bot.event
 async def on_message(message):
+    # Prefilter: chatter outside the streak channels, or without the prefix,
+    # is dropped before any parsing
+    if message.channel.id not in ALLOWED_CHANNELS:
+        return
     if message.author == bot.user:
+        # Remember what the bot said, for cleanup
+        messages.track(message.channel.id, message.id)
+        return
+    if not message.content.startswith(PREFIX):
         return
 
-    # Debug print to check if messages are being received
-    print(f"Message received: {message.content}")
+    messages.track(message.channel.id, message.id)
+    await bot.process_commands(message)
 
-    if message.content.lower() == "hello":
-        await message.channel.send("Hello there!")
 
-    await bot.process_commands(message)
+@bot.event
+async def on_raw_message_delete(payload):
+    messages.forget(payload.channel_id, payload.message_id)
+
+
+@bot.event
+async def on_raw_bulk_message_delete(payload):
+    for message_id in payload.message_ids:
+        messages.forget(payload.channel_id, message_id)
+
+
+# ------------------------------------SCHEDULED JOBS-----------------------------------
+def at(clock, timezone, weekday=None):
+    hour, minute = (int(part) for part in clock.split(":"))
+    return Recurrence(timezone, hour, minute, weekday)
+
+
+async def schedule_jobs(catch_up=False):
+    # One job per time zone and kind, however many users share the zone. A
+    # zone first seen after startup (someone moved into it) catches up on its
+    # latest occurrence, the closed-period check stops double rollovers.
+    for timezone in await store.timezones():
+        if f"rollover:{timezone}" in scheduler:
+            continue
+        scheduler.add(f"rollover:{timezone}", at(ROLLOVER_TIME, timezone),
+                      daily_rollover_job(timezone), priority=0, catch_up=catch_up)
+        scheduler.add(f"morning:{timezone}", at(MORNING_TIME, timezone),
+                      morning_summary_job(timezone), priority=1, catch_up=catch_up)
+        scheduler.add(f"weekly:{timezone}", at(ROLLOVER_TIME, timezone, WEEKLY_DAY),
+                      weekly_rollover_job(timezone), priority=2, catch_up=catch_up)
+
+
+def period_of(due, timezone):
+    # The local date a rollover closes; each profile closes a period once
+    return due.astimezone(pytz.timezone(timezone)).date().isoformat()
+
+
+def daily_rollover_job(timezone):
+    async def job(due):
+        # Close the day for everyone first, then report on it
+        result = await store.roll_over(kind=DAILY, timezone=timezone, period=period_of(due, timezone),
+                                       job=f"rollover:{timezone}", when=due)
+        pending_reports[timezone] = result.reports
+    return job
+
+
+def morning_summary_job(timezone):
+    async def job(due):
+        reports = pending_reports.pop(timezone, None)
+        if not reports:
+            return
+        owner = await bot.application_info()
+        deliveries = {}
+        for report in reports:
+            channel = streak_channel(report.guild_id, DAILY)
+            if channel:
+                deliveries.setdefault(channel, []).extend(morning_report_parts(report, owner.owner.id))
+        # Cleanup is best effort, it must never hold back the reports
+        for error in await asyncio.gather(*(messages.clean(channel) for channel in deliveries),
+                                          return_exceptions=True):
+            if isinstance(error, Exception):
+                print(f"Cleanup before the morning report failed: {error!r}")
+        await outbox.deliver(deliveries)
+        await messages.flush()
+    return job
+
+
+def weekly_rollover_job(timezone):
+    async def job(due):
+        result = await store.roll_over(kind=WEEKLY, timezone=timezone, period=period_of(due, timezone),
+                                       job=f"weekly:{timezone}", when=due)
+        owner = await bot.application_info()
+        deliveries = {}
+        for report in result.reports:
+            channel = streak_channel(report.guild_id, WEEKLY)
+            if channel and (report.completed or report.reset):
+                deliveries.setdefault(channel, []).extend(weekly_report_parts(report, owner.owner.id))
+        await outbox.deliver(deliveries)
+    return job
+
+
+def reset_message(activities):
+    return "```" + "\n".join(f"{activity} has been reset to zero :(" for activity in activities) + "```"
+
+
+def weekly_report_parts(report, owner_id):
+    parts = [f"New week! <@{report.user_id or owner_id}>",
+             summary_message_morning(report.completed).replace("Yesterday", "Last week")]
+    if report.reset:
+        parts.append(reset_message(report.reset))
+    if report.extinguished:
+        parts.append(EXTINGUISH)
+    return parts
+
+
+def morning_report_parts(report, owner_id):
+    parts = [f"Hello! <@{report.user_id or owner_id}>",
+             "Hope you slept well!",
+             "====================================================================",
+             summary_message_morning(report.completed),
+             "===================================================================="]
+
+    # Missed is the number of NONE completed streaks
+    # therefore there is at least one streak not maintained yesterday
+    if report.missed != 0:
+        parts.append(f"**Oh no! {report.missed} streaks were not done yesterday!**")
+        if report.freeze_spent:
+            parts.append(f"{report.freeze_spent} streak freeze was used!")
+            parts.append("Don't give up!! Let's get back on track!!")
+        else:
+            parts.append(f"You don't have enough free streaks to maintain the flames! :(")
+            parts.append(reset_message(report.reset))
+            if report.extinguished:
+                parts.append(EXTINGUISH)
+    else:
+        parts.append("WE ARE STILL ALIVE!!")
+        parts.append(STILL_ALIVE)
+    parts.append("====================================================================")
+    parts.append("Have a wonderful day!")
+    parts.append("====================================================================")
+    return parts
 
 
-async def send_scheduled_message():
-    await bot.wait_until_ready()
-    channel = bot.get_channel(ALLOWED_CHANNEL_ID_DAILY)
-    est = pytz.timezone("America/New_York")  # EST time zone
-    streaks = load_json()
-    count = 0
-
-    while not bot.is_closed():
-        now = datetime.datetime.now(pytz.utc).astimezone(est)
-        target_time = est.localize(datetime.datetime(now.year, now.month, now.day, 7, 47, 0))  # 6:00 AM EST
-
-        if now >= target_time:
-            target_time += datetime.timedelta(days=1)
-
-        wait_time = (target_time - now).total_seconds()
-        print(f"Next message in {wait_time} seconds.")
-
-        await asyncio.sleep(wait_time)
-
-        if channel:
-            await channel.purge(limit=100)
-            owner = await bot.application_info()
-            await channel.send(f"Hello! <@{owner.owner.id}>")
-            await channel.send("Hope you slept well!")
-            await channel.send("====================================================================")
-            await channel.send(summary_message_morning())
-            await channel.send("====================================================================")
-
-            # pick out the details
-            master_count = streaks["master-count"]
-
-            # Iterate through dailyStreaks
-            for activity, details in streaks["daily-streaks"].items():
-                if details["daily"] != details["aim"]:
-                    count += 1
-
-            # Debug
-            print("Count:", count)
-            print("Master Count:", master_count)
-
-            # Count is the number of NONE completed streaks
-            # therefore there is at least one streak not maintained yesterday
-            if count != 0:
-                await channel.send(
-                    f"**Oh no! {count} streaks were not done yesterday!**")
-                if streaks["freeze"] == 0 or streaks["freeze"] < count:
-                    # When all freeze count is zero or less than count
-                    # Iterate through dailyStreaks
-                    # Therefore no streaks were used
-                    await channel.send(f"You don't have enough free streaks to maintain the flames! :(")
-                    for activity, details in streaks["daily-streaks"].items():
-                        if details["daily"] != details["aim"]:
-                            details["daily"] = 0
-                            details["aim"] = 1
-                            await channel.send(f"```{activity} has been reset to zero :(```")
-                        else:
-                            details["aim"] += 1
-                    if count == master_count:
-                        await channel.send(EXTINGUISH)
-
-                else:  # streaks["freeze"] >= count
-                    streaks["freeze"] -= count
-                    await channel.send(f"{count} streak freeze was used!")
-                    await channel.send("Don't give up!! Let's get back on track!!")
-            else:
-                await channel.send("WE ARE STILL ALIVE!!")
-                await channel.send(STILL_ALIVE)
-                index = random.randint(0, 100)
-                if index < 25:
-                    streaks["freeze"] += 1
-                for activity, details in streaks["daily-streaks"].items():
-                    details["aim"] += 1
-            save_json(streaks)
-            await channel.send("====================================================================")
-            await channel.send("Have a wonderful day!")
-            await channel.send("====================================================================")
 # ------------------------------------COMMAND FUNCTIONS-----------------------------------
-@bot.command()
+@streak_command("Delete the bot's recent messages and commands here")
 @commands.has_permissions(manage_messages=True, send_messages=True, read_message_history=True)
 async def clear_channel(ctx, amount: int = 50):
-    channel = bot.get_channel(ALLOWED_CHANNEL_ID_DAILY)
-    if channel == ctx.channel:
-        await channel.purge(limit=amount)
-        await ctx.send(f"✅ Cleared `{amount}` messages in {channel.mention}!", delete_after=3)
+    if streak_kind(ctx) != DAILY:
+        await daily_only(ctx)
+        return
+    # Deleting can outlast the 3 second window an interaction has to answer
+    await ctx.defer(ephemeral=True)
+    cleared = await messages.clean(ctx.channel, amount)
+    await messages.flush()
+    await ctx.send(f"✅ Cleared `{cleared}` messages in {ctx.channel.mention}!", delete_after=3)
 
 
-@bot.command()
+@streak_command("Show every streak and whether it is done")
 @commands.has_permissions(send_messages=True)
 async def summary(ctx):
-    channel = bot.get_channel(ALLOWED_CHANNEL_ID_DAILY)
-    if channel == ctx.channel:
-        await ctx.send(summary_message())
+    kind = streak_kind(ctx)
+    if kind:
+        await ctx.send(await renders.get(f"summary:{kind}", *profile_key(ctx),
+                                         lambda streaks: summary_message(streaks, kind)))
 
 
-@bot.command()
+@streak_command("List the streaks still to complete")
 @commands.has_permissions(send_messages=True)
 async def left(ctx):
-    channel = bot.get_channel(ALLOWED_CHANNEL_ID_DAILY)
-    await ctx.send("For today, you need to complete:")
-    if channel == ctx.channel:
-        if left_message() != "``````":
-            await ctx.send(left_message())
+    kind = streak_kind(ctx)
+    await ctx.send("For today, you need to complete:" if kind != WEEKLY else "For this week, you need to complete:")
+    if kind:
+        left_output = await renders.get(f"left:{kind}", *profile_key(ctx),
+                                        lambda streaks: left_message(streaks, kind))
+        if left_output != "``````":
+            await ctx.send(left_output)
         else:
             await ctx.send("Ah you completed everything!!")
             await ctx.send(FIRED_UP)
 
 
-@bot.command()
+@streak_command("Say hi")
 @commands.has_permissions(send_messages=True)
 async def hi(ctx):
     index = random.Random().random() * 100
@@ -257,90 +399,216 @@ async def hi(ctx):
         message = f"Bonjour! {ctx.author.mention}!"
     else:
         message = f"I wonder if you will achieve your dream"
-    channel = bot.get_channel(ALLOWED_CHANNEL_ID_DAILY)
-    if channel == ctx.channel:
+    if streak_kind(ctx) == DAILY:
         await ctx.send(f"{message}")
+    else:
+        await daily_only(ctx)
+
+
+async def expand_groups(ctx, kind, categories, tracked_only):
+    """Resolve ``@group`` arguments into streak names, keeping order and dropping repeats.
+
+    With ``tracked_only`` group members that are no longer tracked are skipped,
+    so removing a streak does not break the routines it belonged to. Returns
+    the names and any unknown groups.
+    """
+    if not any(category.startswith("@") for category in categories):
+        return list(dict.fromkeys(categories)), []
+    profile = await store.profile(*profile_key(ctx))
+    groups = profile.get(f"{kind}-groups", {})
+    streaks = profile[f"{kind}-streaks"]
+    names = []
+    unknown = []
+    for category in categories:
+        if not category.startswith("@"):
+            names.append(category)
+        elif category[1:] in groups:
+            names.extend(name for name in groups[category[1:]] if not tracked_only or name in streaks)
+        else:
+            unknown.append(category)
+    return list(dict.fromkeys(names)), unknown
 
 
-@bot.command()
+def listing(names):
+    return ", ".join(names)
+
+
+@streak_command("Start tracking streaks or @groups")
 @commands.has_permissions(send_messages=True)
-async def add(ctx, category: str = ""):
-    channel = bot.get_channel(ALLOWED_CHANNEL_ID_DAILY)
-    if channel == ctx.channel:
-        streaks = load_json()
-        new_entry = {
-            "daily": 0,
-            "aim": 1
-        }
-        streaks["master-count"] += 1
-        streaks["daily-streaks"][category] = new_entry
-        save_json(streaks)
-        await ctx.send(f"{category} was successfully added!")
-
-
-@bot.command()
+async def add(ctx, *, categories: str = ""):
+    kind = streak_kind(ctx)
+    if kind:
+        names, unknown = await expand_groups(ctx, kind, categories.split(), tracked_only=False)
+        if unknown:
+            await ctx.send(f"Group {listing(unknown)} not found.")
+            return
+        if not names:
+            await ctx.send("Please provide a streak name!")
+            return
+        added = await store.add_many(*profile_key(ctx), names, kind)
+        lines = []
+        if added:
+            lines.append(f"{listing(added)} {'was' if len(added) == 1 else 'were'} successfully added!")
+        existing = [name for name in names if name not in added]
+        if existing:
+            lines.append(f"{listing(existing)} {'is' if len(existing) == 1 else 'are'} already tracked.")
+        await ctx.send("\n".join(lines))
+
+
+@streak_command("Define, remove or list @groups of streaks")
+@commands.has_permissions(send_messages=True)
+async def group(ctx, name: str = "", *, members: str = ""):
+    kind = streak_kind(ctx)
+    if kind:
+        name = name.lstrip("@")
+        if not name:
+            groups = (await store.profile(*profile_key(ctx))).get(f"{kind}-groups", {})
+            if groups:
+                await ctx.send("```" + "\n".join(f"@{group_name}: {listing(group_members)}"
+                                                  for group_name, group_members in groups.items()) + "```")
+            else:
+                await ctx.send("No groups yet! Try `!group morning leetcode exercise`.")
+            return
+        members = list(dict.fromkeys(member for member in members.split() if not member.startswith("@")))
+        await store.set_group(*profile_key(ctx), name, members, kind)
+        if members:
+            await ctx.send(f"@{name} now covers {listing(members)}.")
+        else:
+            await ctx.send(f"@{name} was removed.")
+
+
+@streak_command("Show how many streak freezes you have")
 @commands.has_permissions(send_messages=True)
 async def freeze_check(ctx):
-    channel = bot.get_channel(ALLOWED_CHANNEL_ID_DAILY)
-    if channel == ctx.channel:
-        streaks = load_json()
-        freeze_count = streaks["freeze"]
-        await ctx.send(f"You currently have {freeze_count} freeze streak!!")
+    if streak_kind(ctx) != DAILY:
+        await daily_only(ctx)
+        return
+    freeze_count = await store.freeze(*profile_key(ctx))
+    await ctx.send(f"You currently have {freeze_count} freeze streak!!")
 
 
-@bot.command()
+@streak_command("Stop tracking streaks or @groups")
 @commands.has_permissions(send_messages=True)
-async def remove(ctx, category: str = ""):
-    channel = bot.get_channel(ALLOWED_CHANNEL_ID_DAILY)
-    deleted = 0
-    to_be_deleted = 0
-    if channel == ctx.channel:
-        streaks = load_json()
-
-        for activity, details in streaks["daily-streaks"].items():
-            if activity == category:
-                to_be_deleted = 1
-            if to_be_deleted:
-                del streaks["daily-streaks"][category]  # Remove the entry
-                streaks["master-count"] -= 1
-                save_json(streaks)
-                await ctx.send(f"Entry '{category}' removed successfully!")
-                deleted = 1
-            if not deleted:
-                await ctx.send(f"Entry '{category}' not found in daily-streaks.")
-
-
-@bot.command()
+async def remove(ctx, *, categories: str = ""):
+    kind = streak_kind(ctx)
+    if kind:
+        names, unknown = await expand_groups(ctx, kind, categories.split(), tracked_only=True)
+        if unknown:
+            await ctx.send(f"Group {listing(unknown)} not found.")
+            return
+        if not names:
+            await ctx.send("Please provide a streak name!")
+            return
+        results = await store.remove_many(*profile_key(ctx), names, kind)
+        missing = [name for name, removed in results.items() if not removed]
+        entries = "Entry" if len(names) == 1 else "Entries"
+        if missing:
+            await ctx.send(f"{entries} {listing(repr(name) for name in missing)} not found in {kind}-streaks."
+                           + ("" if len(names) == 1 else " Nothing was removed."))
+        else:
+            await ctx.send(f"{entries} {listing(repr(name) for name in names)} removed successfully!")
+
+
+@streak_command("Mark streaks or @groups as done")
 @commands.has_permissions(send_messages=True)
-async def done(ctx, category: str = ""):
-    channel = bot.get_channel(ALLOWED_CHANNEL_ID_DAILY)
+async def done(ctx, *, categories: str = ""):
+    kind = streak_kind(ctx)
 
-    if channel == ctx.channel:
+    if kind:
+        names, unknown = await expand_groups(ctx, kind, categories.split(), tracked_only=True)
+        if unknown:
+            await ctx.send(f"Group {listing(unknown)} not found.")
+            return
+        if not names:
+            await ctx.send("Please provide a streak name!")
+            return
+
+        results = await store.done_many(*profile_key(ctx), names, kind)
+        missing = [name for name, result in results.items() if result == DONE_MISSING]
+        if missing:
+            await ctx.send(f"Streak {listing(missing)} not found."
+                           + ("" if len(names) == 1 else " Nothing was updated."))
+            return
+        updated = [name for name, result in results.items() if result == DONE_UPDATED]
+        already = [name for name, result in results.items() if result != DONE_UPDATED]
+        lines = []
+        if updated:
+            lines.append(f"{listing(updated)} streaks updated")
+        if already:
+            lines.append(f"{listing(already)} streaks already updated")
+        await ctx.send("\n".join(lines))
+
+
+def streak_view(kind, category, render):
+    # Render one streak's details (with its profile), or a not-found reply if it is not tracked
+    def view(profile):
+        details = profile[f"{kind}-streaks"].get(category)
+        return render(details, profile) if details else f"Streak {category} not found."
+    return view
+
+
+@streak_command("Longest run and completion rates for a streak")
+@commands.has_permissions(send_messages=True)
+async def history(ctx, category: str = ""):
+    kind = streak_kind(ctx)
+    if kind:
         if not category:
             await ctx.send("Please provide a streak name!")
             return
+        await ctx.send(await renders.get(f"history:{kind}:{category}", *profile_key(ctx), streak_view(
+            kind, category, lambda details, profile: analytics.history_message(category, details, kind))))
+
+
+@streak_command("Calendar of a streak's recent history")
+@commands.has_permissions(send_messages=True)
+async def heatmap(ctx, category: str = ""):
+    kind = streak_kind(ctx)
+    if kind:
+        if not category:
+            await ctx.send("Please provide a streak name!")
+            return
+        if kind == DAILY:
+            hour, minute = (int(part) for part in ROLLOVER_TIME.split(":"))
+            render = lambda details, profile: analytics.heatmap_message(category, details, analytics.last_closed_day(
+                profile.get("closed", {}).get(DAILY), profile.get("timezone", DEFAULT_TIMEZONE), hour, minute))
+        else:
+            render = lambda details, profile: analytics.strip_message(category, details)
+        # Keyed by date too, so a cached calendar never outlives the day it was drawn on
+        await ctx.send(await renders.get(f"heatmap:{kind}:{category}:{time.strftime('%Y-%m-%d', time.gmtime())}",
+                                         *profile_key(ctx), streak_view(kind, category, render)))
+
+
+@streak_command("Set the time zone your streaks roll over in")
+@commands.has_permissions(send_messages=True)
+async def timezone(ctx, name: str = ""):
+    if not streak_kind(ctx):
+        return
+    if name not in pytz.all_timezones_set:
+        await ctx.send("Please provide a time zone like `America/New_York` or `Europe/Paris`!")
+        return
+    await store.set_timezone(*profile_key(ctx), name)
+    if scheduler is not None:
+        await schedule_jobs(catch_up=True)
+    await ctx.send(f"Your streaks now roll over at {ROLLOVER_TIME} {name} time.")
+
 
-        streaks = load_json()
-        channel = bot.get_channel(ALLOWED_CHANNEL_ID_DAILY)
-        found = False
-        if channel == ctx.channel:
-            for activity, details in streaks["daily-streaks"].items():
-                if activity == category:
-                    if details["daily"] < details["aim"]:
-                        details["daily"] += 1
-                        save_json(streaks)
-                        await ctx.send(f"{category} streaks updated")
-                    else:
-                        await ctx.send(f"{category} streaks already updated")
-                    found = True
-                    break
-            if not found:
-                await ctx.send(f"Streak {category} not found.")
+@streak_command("Bot latency and throughput metrics")
+@commands.has_permissions(administrator=True)
+async def stats(ctx):
+    for message in compose([stats_report(registry)]):
+        await ctx.send(message)
 
 
 # ------------MAIN ENTRY POINT------------
 def main() -> None:
-    bot.run(TOKEN)
+    store.load()
+    messages.load()
+    try:
+        bot.run(TOKEN)
+    finally:
+        # Anything still waiting on the debounce timer gets written here.
+        store.save()
+        messages.save()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,112 @@
+import asyncio
+import datetime
+import json
+import os
+
+import discord
+
+from metrics import registry
+from atomic_file import atomic_write
+
+BULK_LIMIT = 100
+# Discord refuses bulk deletes of messages older than 14 days; keep a margin
+BULK_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5)
+
+
+# ------------MESSAGE INDEX------------
+class MessageIndex:
+    """IDs of the messages worth cleaning up, per channel, oldest first.
+
+    The bot's own messages and the commands that triggered them are recorded
+    as they arrive, so cleanup deletes exactly those IDs instead of crawling
+    channel history. Each channel keeps at most ``max_per_channel`` IDs.
+    """
+
+    def __init__(self, path=None, max_per_channel=1000):
+        self.path = path
+        self.max_per_channel = max_per_channel
+        self._channels = {}
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as file:
+            saved = json.load(file)
+        for channel_id, message_ids in saved.items():
+            for message_id in message_ids:
+                self.track(int(channel_id), message_id)
+
+    def _snapshot(self):
+        return json.dumps({channel_id: list(message_ids) for channel_id, message_ids in self._channels.items()})
+
+    async def flush(self):
+        # Serialise on the loop, where track/forget run, and write off it.
+        if self.path:
+            text = self._snapshot()
+            await asyncio.to_thread(atomic_write, self.path, text)
+
+    def save(self):
+        if self.path:
+            atomic_write(self.path, self._snapshot())
+
+    def track(self, channel_id, message_id):
+        message_ids = self._channels.setdefault(channel_id, {})
+        message_ids[message_id] = None
+        if len(message_ids) > self.max_per_channel:
+            del message_ids[next(iter(message_ids))]
+
+    def forget(self, channel_id, message_id):
+        self._channels.get(channel_id, {}).pop(message_id, None)
+
+    def __len__(self):
+        return sum(len(message_ids) for message_ids in self._channels.values())
+
+    def take(self, channel_id, limit=None):
+        """Remove and return the newest ``limit`` IDs for the channel (all of them by default)."""
+        message_ids = self._channels.get(channel_id, {})
+        newest = sorted(message_ids, reverse=True)[:limit]
+        for message_id in newest:
+            del message_ids[message_id]
+        return newest
+
+    def restore(self, channel_id, message_ids):
+        """Put back IDs that could not be deleted, so the next cleanup retries them."""
+        if message_ids:
+            current = self._channels.setdefault(channel_id, {})
+            self._channels[channel_id] = dict.fromkeys(sorted([*current, *message_ids])[-self.max_per_channel:])
+
+    # --------CLEANUP--------
+    async def clean(self, channel, limit=None):
+        """Delete the tracked messages in ``channel``; returns how many were removed.
+
+        Recent messages go out in bulk-delete calls of up to 100 IDs, only
+        messages past the bulk-delete window are deleted one by one. Cleanup
+        is best effort: IDs that fail to delete are kept for the next run.
+        """
+        message_ids = self.take(channel.id, limit)
+        cutoff = discord.utils.utcnow() - BULK_MAX_AGE
+        recent = [message_id for message_id in message_ids if discord.utils.snowflake_time(message_id) > cutoff]
+        old = [message_id for message_id in message_ids if discord.utils.snowflake_time(message_id) <= cutoff]
+        deleted = 0
+        for start in range(0, len(recent), BULK_LIMIT):
+            chunk = recent[start:start + BULK_LIMIT]
+            try:
+                with registry.timer("cleanup.bulk_delete"):
+                    await channel.delete_messages([discord.Object(message_id) for message_id in chunk])
+                deleted += len(chunk)
+            except discord.HTTPException:
+                # Fall back to single deletes so one bad ID does not keep the rest
+                old.extend(chunk)
+        failed = []
+        for message_id in old:
+            try:
+                with registry.timer("cleanup.delete"):
+                    await channel.get_partial_message(message_id).delete()
+                deleted += 1
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as error:
+                registry.count(f"cleanup.http_{error.status}")
+                failed.append(message_id)
+        self.restore(channel.id, failed)
+        return deleted
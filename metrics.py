@@ -0,0 +1,122 @@
+import asyncio
+import bisect
+import json
+import time
+from contextlib import contextmanager
+
+from atomic_file import atomic_write
+
+# Histogram bucket upper bounds in milliseconds, roughly x2.5 apart
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+# ------------HISTOGRAM------------
+class Histogram:
+    """Fixed-bucket latency histogram; recording is O(log buckets) and memory is constant."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, fraction):
+        """Upper bound (ms) of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max, 3),
+            "buckets": {f"le_{bound}": count for bound, count in zip(BUCKETS_MS, self.counts)},
+        }
+
+
+# ------------REGISTRY------------
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        return {
+            "uptime_s": round(time.time() - self.started),
+            "counters": dict(self.counters),
+            "histograms": {name: histogram.as_dict() for name, histogram in sorted(self.histograms.items())},
+        }
+
+    def summary_lines(self, prefix=""):
+        lines = [f"{'metric':<28}{'count':>8}{'p50':>9}{'p99':>9}{'max':>9}"]
+        for name, histogram in sorted(self.histograms.items()):
+            if name.startswith(prefix):
+                lines.append(f"{name:<28}{histogram.count:>8}{histogram.percentile(0.5):>9.1f}"
+                             f"{histogram.percentile(0.99):>9.1f}{histogram.max:>9.1f}")
+        for name, value in sorted(self.counters.items()):
+            if name.startswith(prefix):
+                lines.append(f"{name:<28}{value:>8}")
+        return lines
+
+
+registry = Metrics()
+
+
+def stats_report(metrics):
+    """The !stats report as one code block, timings in milliseconds."""
+    lines = [f"uptime {round(time.time() - metrics.started)}s"] + metrics.summary_lines()
+    return "```" + "\n".join(lines) + "```"
+
+
+# ------------BACKGROUND TASKS------------
+async def watch_loop_lag(interval=0.5):
+    """Record how late a short sleep wakes up; sustained lag means something is blocking the loop."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        registry.observe("loop.lag", max(0.0, time.perf_counter() - start - interval))
+
+
+async def dump_periodically(path, interval=60):
+    while True:
+        await asyncio.sleep(interval)
+        text = json.dumps(registry.snapshot(), indent=4)
+        try:
+            await asyncio.to_thread(atomic_write, path, text)
+        except OSError as error:
+            print(f"Could not write metrics to {path}: {error}")
@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import discord
+
+from metrics import registry
+
+MESSAGE_LIMIT = 2000
+FENCE = "```"
+
+
+# ------------MESSAGE COMPOSER------------
+def _split_block(part, limit):
+    # Break an oversized part on line boundaries, re-fencing code blocks so
+    # every piece still renders on its own.
+    fenced = part.startswith(FENCE) and part.endswith(FENCE) and len(part) > 2 * len(FENCE)
+    body = part[len(FENCE):-len(FENCE)] if fenced else part
+    opener = FENCE
+    if fenced and body.startswith("\n"):
+        # Keep the fence on a line of its own in every piece, or the first
+        # line of code would be read as the block's language
+        opener = f"{FENCE}\n"
+        body = body[1:]
+    room = limit - (len(opener) + len(FENCE) if fenced else 0)
+    pieces = []
+    current = ""
+    for line in body.split("\n"):
+        while len(line) > room:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:room])
+            line = line[room:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > room:
+            pieces.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return [f"{opener}{piece}{FENCE}" if fenced else piece for piece in pieces]
+
+
+def compose(parts, limit=MESSAGE_LIMIT):
+    """Pack message parts, in order, into as few messages of at most ``limit`` characters."""
+    messages = []
+    current = ""
+    for part in parts:
+        if not part:
+            continue
+        for piece in (_split_block(part, limit) if len(part) > limit else [part]):
+            candidate = f"{current}\n{piece}" if current else piece
+            if len(candidate) > limit:
+                messages.append(current)
+                current = piece
+            else:
+                current = candidate
+    if current:
+        messages.append(current)
+    return messages
+
+
+# ------------RATE-LIMITED SEND QUEUE------------
+class ChannelBucket:
+    """Token bucket matching Discord's per-channel message limit (5 per 5 seconds)."""
+
+    def __init__(self, capacity=5, per=5.0):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def delay(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, seconds):
+        self.blocked_until = time.monotonic() + seconds
+        self.tokens = 0
+
+
+class Outbox:
+    """Serialises sends per channel, paced by a token bucket and retried on 429/5xx.
+
+    Each channel gets its own queue and worker, so slow or limited channels do
+    not hold the others back.
+    """
+
+    def __init__(self, retries=3, backoff=1.0, capacity=5, per=5.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.capacity = capacity
+        self.per = per
+        self._queues = {}
+        self._workers = {}
+        self._buckets = {}
+
+    async def send(self, channel, content=None, **kwargs):
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.setdefault(channel.id, asyncio.Queue())
+        queue.put_nowait((channel, content, kwargs, future))
+        worker = self._workers.get(channel.id)
+        if worker is None or worker.done():
+            self._workers[channel.id] = asyncio.create_task(self._drain(channel.id))
+        return await future
+
+    async def send_parts(self, channel, parts):
+        """Compose ``parts`` and send the result; returns the sent messages."""
+        messages = compose(parts)
+        return await asyncio.gather(*(self.send(channel, message) for message in messages))
+
+    async def deliver(self, batches):
+        """Send ``{channel: parts}`` to every channel at once."""
+        await asyncio.gather(*(self.send_parts(channel, parts) for channel, parts in batches.items()))
+
+    async def _drain(self, channel_id):
+        queue = self._queues[channel_id]
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            bucket = self._buckets[channel_id] = ChannelBucket(self.capacity, self.per)
+        while not queue.empty():
+            channel, content, kwargs, future = queue.get_nowait()
+            try:
+                future.set_result(await self._send_with_retry(bucket, channel, content, kwargs))
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+
+    async def _send_with_retry(self, bucket, channel, content, kwargs):
+        for attempt in range(self.retries + 1):
+            wait = bucket.delay()
+            if wait:
+                registry.observe("send.rate_limit_wait", wait)
+                await asyncio.sleep(wait)
+            bucket.take()
+            try:
+                with registry.timer("send.latency"):
+                    return await channel.send(content, **kwargs)
+            except discord.RateLimited as error:
+                registry.count("send.rate_limited")
+                bucket.block(error.retry_after)
+            except discord.HTTPException as error:
+                registry.count(f"send.http_{error.status}")
+                if error.status == 429:
+                    bucket.block(self.backoff * 2 ** attempt)
+                elif error.status < 500 or attempt == self.retries:
+                    raise
+                else:
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+        raise RuntimeError(f"Gave up sending to channel {channel.id} after {self.retries + 1} attempts")
@@ -0,0 +1,38 @@
+from collections import OrderedDict
+
+
+# ------------RENDER CACHE------------
+class RenderCache:
+    """Rendered views per (view, guild, user), reused until the store changes.
+
+    Entries are tagged with ``store.cache_token(guild_id, user_id)``; once a
+    mutation or rollover moves the token on, the next request re-renders.
+    Least recently used entries are dropped past ``max_entries``.
+    """
+
+    def __init__(self, store, max_entries=10000):
+        self.store = store
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    async def get(self, view, guild_id, user_id, render):
+        """Return ``render(profile)`` for the profile, from cache when still current."""
+        key = (view, guild_id, user_id)
+        token = self.store.cache_token(guild_id, user_id)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == token:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        text = render(await self.store.profile(guild_id, user_id))
+        # Only keep it if nothing changed while the profile was being read
+        if self.store.cache_token(guild_id, user_id) == token:
+            self._entries[key] = (token, text)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return text
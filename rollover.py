@@ -0,0 +1,138 @@
+import random
+from dataclasses import dataclass, field
+
+import analytics
+
+# Chance (out of 100) of earning a freeze on a day where nothing was missed
+FREEZE_EARN_CHANCE = 25
+
+
+# ------------ROLLOVER INPUT AND OUTPUT------------
+@dataclass
+class RolloverBatch:
+    """Every tracked streak flattened into parallel columns.
+
+    ``owners``/``freeze`` have one entry per (guild, user) profile; ``owner``,
+    ``names``, ``daily``, ``aim`` and ``stats`` have one entry per streak, with
+    ``owner`` holding the index of the profile the streak belongs to.
+    """
+    owners: list = field(default_factory=list)
+    freeze: list = field(default_factory=list)
+    owner: list = field(default_factory=list)
+    names: list = field(default_factory=list)
+    daily: list = field(default_factory=list)
+    aim: list = field(default_factory=list)
+    stats: list = field(default_factory=list)
+
+
+@dataclass
+class OwnerReport:
+    guild_id: object
+    user_id: object
+    completed: list
+    reset: list
+    missed: int
+    freeze_spent: int
+    freeze_earned: int
+    freeze: int
+    extinguished: bool
+
+
+@dataclass
+class RolloverResult:
+    daily: list
+    aim: list
+    stats: list
+    freeze: list
+    reports: list
+
+
+def collect(owner_rows, streak_rows):
+    """Build a batch from (guild, user, freeze) and (guild, user, name, daily, aim[, stats]) rows."""
+    batch = RolloverBatch()
+    index = {}
+    for guild_id, user_id, freeze in owner_rows:
+        index[(guild_id, user_id)] = len(batch.owners)
+        batch.owners.append((guild_id, user_id))
+        batch.freeze.append(freeze)
+    for guild_id, user_id, name, daily, aim, *stats in streak_rows:
+        key = (guild_id, user_id)
+        if key not in index:
+            index[key] = len(batch.owners)
+            batch.owners.append(key)
+            batch.freeze.append(0)
+        batch.owner.append(index[key])
+        batch.names.append(name)
+        batch.daily.append(daily)
+        batch.aim.append(aim)
+        batch.stats.append(stats[0] if stats else analytics.EMPTY)
+    return batch
+
+
+# ------------ROLLOVER RULES------------
+def owner_rules(freeze, totals, missed, rng=None, freezes=True):
+    """Decide each profile's freezes from its streak and missed counts.
+
+    Returns the parallel ``covered``, ``spent``, ``earned``, ``freeze`` and
+    ``extinguished`` columns. Profiles without streaks of the kind are left
+    alone, nothing is spent or earned for them.
+    """
+    rng = rng or random.Random()
+    owners = len(freeze)
+    if freezes:
+        covered = [count > 0 and have >= count for count, have in zip(missed, freeze)]
+        spent = [count if cover else 0 for count, cover in zip(missed, covered)]
+        earned = [1 if total and count == 0 and rng.randint(0, 100) < FREEZE_EARN_CHANCE else 0
+                  for count, total in zip(missed, totals)]
+    else:
+        covered = [False] * owners
+        spent = earned = [0] * owners
+    new_freeze = [have - use + gain for have, use, gain in zip(freeze, spent, earned)]
+    extinguished = [count > 0 and not cover and count == total
+                    for count, cover, total in zip(missed, covered, totals)]
+    return covered, spent, earned, new_freeze, extinguished
+
+
+def roll_over(batch, rng=None, freezes=True):
+    """Close the day for every profile in one pass over the batch columns.
+
+    A streak is missed when ``daily`` never reached ``aim``. If a profile has
+    enough freezes to cover all of its missed streaks they are spent and the
+    missed streaks are held as they are; otherwise the missed streaks reset to
+    zero, and missing every streak extinguishes the flame. Completed streaks
+    always move on to the next day's aim. A clean day may earn a freeze.
+    Every streak's rolling history stats advance by the period just closed.
+
+    With ``freezes`` off (weekly streaks) nothing is spent or earned.
+    Profiles without streaks in the batch get no report.
+    """
+    owners = len(batch.owners)
+    totals = [0] * owners
+    missed = [0] * owners
+    for owner, daily, aim in zip(batch.owner, batch.daily, batch.aim):
+        totals[owner] += 1
+        if daily != aim:
+            missed[owner] += 1
+    covered, spent, earned, freeze, extinguished = owner_rules(batch.freeze, totals, missed, rng, freezes)
+
+    completed = [[] for _ in range(owners)]
+    reset = [[] for _ in range(owners)]
+    new_daily = list(batch.daily)
+    new_aim = list(batch.aim)
+    new_stats = [analytics.advance(stats, daily == aim, daily)
+                 for stats, daily, aim in zip(batch.stats, batch.daily, batch.aim)]
+    for i, (owner, name, daily, aim) in enumerate(zip(batch.owner, batch.names, batch.daily, batch.aim)):
+        if daily == aim:
+            new_aim[i] = aim + 1
+            completed[owner].append(name)
+        elif not covered[owner]:
+            new_daily[i] = 0
+            new_aim[i] = 1
+            reset[owner].append(name)
+
+    reports = [
+        OwnerReport(guild_id, user_id, completed[o], reset[o], missed[o],
+                    spent[o], earned[o], freeze[o], extinguished[o])
+        for o, (guild_id, user_id) in enumerate(batch.owners) if totals[o]
+    ]
+    return RolloverResult(new_daily, new_aim, new_stats, freeze, reports)
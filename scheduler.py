@@ -0,0 +1,121 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+
+import pytz
+
+# Upper bound on one sleep so a suspended host or a clock change is noticed
+MAX_SLEEP = 300
+# A failed job is retried for the same occurrence, backing off up to an hour
+RETRY_DELAY = datetime.timedelta(minutes=1)
+MAX_RETRY_DELAY = datetime.timedelta(hours=1)
+
+
+# ------------RECURRENCE RULES------------
+class Recurrence:
+    """A wall-clock time in a time zone, every day or on one weekday (0 = Monday)."""
+
+    def __init__(self, timezone, hour, minute, weekday=None):
+        self.tz = pytz.timezone(timezone)
+        self.time = datetime.time(hour, minute)
+        self.weekday = weekday
+
+    def next_after(self, when):
+        """First occurrence strictly after the aware datetime ``when``, in UTC."""
+        day = when.astimezone(self.tz).date()
+        while True:
+            if self.weekday is None or day.weekday() == self.weekday:
+                local = self.tz.normalize(self.tz.localize(datetime.datetime.combine(day, self.time)))
+                if local > when:
+                    return local.astimezone(pytz.utc)
+            day += datetime.timedelta(days=1)
+
+
+# ------------SCHEDULER------------
+class Scheduler:
+    """Runs recurring jobs from a min-heap with one sleeping task.
+
+    ``last_runs`` maps job keys to the ISO time they last fired. A job whose
+    next occurrence after that time has already passed (the bot was down over
+    the boundary) runs once as soon as the scheduler starts. ``on_run`` is
+    awaited with the key and time after every successful run so it can be
+    persisted. A run that raises is retried with backoff and is not recorded.
+    """
+
+    def __init__(self, last_runs=None, on_run=None):
+        self.last_runs = dict(last_runs or {})
+        self.on_run = on_run
+        self._heap = []
+        self._jobs = {}
+        self._order = itertools.count()
+        self._failures = {}
+        self._wake = asyncio.Event()
+
+    def __contains__(self, key):
+        return key in self._jobs
+
+    def add(self, key, recurrence, callback, priority=0, catch_up=False):
+        """Schedule ``callback(due)``; jobs due at the same time run by ``priority``.
+
+        A job that never ran starts at its next occurrence, or with
+        ``catch_up`` at its most recent one, which may already be due.
+        """
+        now = datetime.datetime.now(pytz.utc)
+        last_run = self.last_runs.get(key)
+        if last_run is not None:
+            due = recurrence.next_after(datetime.datetime.fromisoformat(last_run))
+        elif catch_up:
+            due = recurrence.next_after(now - datetime.timedelta(days=1 if recurrence.weekday is None else 7))
+        else:
+            due = recurrence.next_after(now)
+        self._jobs[key] = (recurrence, callback, priority)
+        self._push(due, priority, key, due)
+        self._wake.set()
+
+    def _push(self, when, priority, key, due):
+        # ``when`` orders the heap, ``due`` is the occurrence handed to the callback
+        heapq.heappush(self._heap, (when, priority, next(self._order), key, due))
+
+    def next_due(self):
+        return self._heap[0][0] if self._heap else None
+
+    async def run(self):
+        while True:
+            if not self._heap:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+
+            when, priority, order, key, due = self._heap[0]
+            delay = (when - datetime.datetime.now(pytz.utc)).total_seconds()
+            if delay > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=min(delay, MAX_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            recurrence, callback, priority = self._jobs[key]
+            try:
+                await callback(due)
+            except Exception as error:
+                failures = self._failures[key] = self._failures.get(key, 0) + 1
+                retry = min(RETRY_DELAY * 2 ** (failures - 1), MAX_RETRY_DELAY)
+                print(f"Scheduled job {key} failed ({failures}x), retrying in {retry}: {error!r}")
+                self._push(datetime.datetime.now(pytz.utc) + retry, priority, key, due)
+                continue
+            self._failures.pop(key, None)
+            now = datetime.datetime.now(pytz.utc)
+            self.last_runs[key] = now.isoformat()
+            if self.on_run is not None:
+                try:
+                    await self.on_run(key, now)
+                except Exception as error:
+                    # The job itself went through; the next start may run it once more
+                    print(f"Recording scheduled job {key} failed: {error!r}")
+            # Missed occurrences collapse into the run that just happened
+            due = recurrence.next_after(max(due, now))
+            self._push(due, priority, key, due)
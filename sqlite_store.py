@@ -0,0 +1,468 @@
+import argparse
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import analytics
+import rollover
+from metrics import registry
+from store import read_state, DONE_UPDATED, DONE_ALREADY, DONE_MISSING, DAILY, WEEKLY, DEFAULT_TIMEZONE
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS profiles (
+    guild_id INTEGER NOT NULL,
+    user_id  INTEGER NOT NULL,
+    freeze   INTEGER NOT NULL DEFAULT 0,
+    timezone TEXT    NOT NULL DEFAULT '{DEFAULT_TIMEZONE}',
+    closed_daily  TEXT,
+    closed_weekly TEXT,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS streaks (
+    guild_id INTEGER NOT NULL,
+    user_id  INTEGER NOT NULL,
+    kind     TEXT    NOT NULL,
+    name     TEXT    NOT NULL,
+    daily    INTEGER NOT NULL DEFAULT 0,
+    aim      INTEGER NOT NULL DEFAULT 1,
+    history  BLOB,
+    longest  INTEGER NOT NULL DEFAULT 0,
+    done7    INTEGER NOT NULL DEFAULT 0,
+    done30   INTEGER NOT NULL DEFAULT 0,
+    done365  INTEGER NOT NULL DEFAULT 0,
+    days     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id, kind, name)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS streak_groups (
+    guild_id INTEGER NOT NULL,
+    user_id  INTEGER NOT NULL,
+    kind     TEXT    NOT NULL,
+    name     TEXT    NOT NULL,
+    members  TEXT    NOT NULL,
+    PRIMARY KEY (guild_id, user_id, kind, name)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS schedule (
+    job      TEXT NOT NULL PRIMARY KEY,
+    last_run TEXT NOT NULL
+);
+"""
+
+# Rolling analytics columns, in analytics.FIELDS order
+STATS_COLUMNS = ("history", "longest", "done7", "done30", "done365", "days")
+
+
+def roll_history(blob, completed):
+    """SQL function: shift one closed period into a stored history bitmask."""
+    # Inlined blob conversions: this runs once per streak at every rollover.
+    history = int.from_bytes(blob, "little") if blob else 0
+    return (((history << 1) | completed) & analytics.HISTORY_MASK).to_bytes(analytics.HISTORY_BYTES, "little")
+
+
+# Every byte value in order: instr() on it turns a one-byte blob into its value
+BYTE_VALUES = "x'" + bytes(range(256)).hex() + "'"
+
+
+def history_bit(column, bit):
+    """SQL expression for one bit of a history blob, evaluated without a Python call."""
+    byte, offset = divmod(bit, 8)
+    return f"((instr({BYTE_VALUES}, ifnull(substr({column}, {byte + 1}, 1), x'00')) - 1) >> {offset} & 1)"
+
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS profiles_timezone ON profiles (timezone);
+"""
+
+
+def upgrade_schema(conn):
+    conn.executescript(SCHEMA)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(profiles)")}
+    if "timezone" not in columns:
+        conn.execute(f"ALTER TABLE profiles ADD COLUMN timezone TEXT NOT NULL DEFAULT '{DEFAULT_TIMEZONE}'")
+    for kind in (DAILY, WEEKLY):
+        if f"closed_{kind}" not in columns:
+            conn.execute(f"ALTER TABLE profiles ADD COLUMN closed_{kind} TEXT")
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(streaks)")}
+    for column in STATS_COLUMNS:
+        if column not in columns:
+            kind = "BLOB" if column == "history" else "INTEGER NOT NULL DEFAULT 0"
+            conn.execute(f"ALTER TABLE streaks ADD COLUMN {column} {kind}")
+    conn.executescript(INDEXES)
+
+
+# ------------SQLITE STREAK STORE------------
+class SqliteStreakStore:
+    """Streaks for many (guild, user) pairs in one SQLite database.
+
+    Every row is addressed through the (guild, user, kind, name) primary key,
+    so lookups and updates are B-tree seeks instead of scans. All queries run
+    on a single worker thread which owns the connection, keeping the event
+    loop free and writes serialised.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = 0
+        self.epoch = 0
+        self.profile_versions = {}
+        self.writes = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="streaks-db")
+        self._conn = None
+
+    def load(self):
+        self._executor.submit(self._open).result()
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.create_function("roll_history", 2, roll_history, deterministic=True)
+        upgrade_schema(self._conn)
+        self._conn.commit()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        with registry.timer("storage.query"):
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    def _write(self, func, *args):
+        # Runs on the worker thread: one transaction per call.
+        with self._conn:
+            result = func(self._conn, *args)
+        self.writes += 1
+        return result
+
+    def _mutated(self, guild_id=None, user_id=None):
+        # Changes to one profile only invalidate that profile's cached views,
+        # changes without a profile (rollovers) invalidate everything.
+        self.version += 1
+        if guild_id is None:
+            self.epoch += 1
+        else:
+            key = (guild_id, user_id)
+            self.profile_versions[key] = self.profile_versions.get(key, 0) + 1
+
+    def cache_token(self, guild_id, user_id):
+        return self.epoch, self.profile_versions.get((guild_id, user_id), 0)
+
+    # --------READS--------
+    async def profile(self, guild_id, user_id):
+        return await self._run(self._profile, guild_id, user_id)
+
+    def _profile(self, guild_id, user_id):
+        row = self._conn.execute(
+            "SELECT freeze, timezone, closed_daily, closed_weekly FROM profiles WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id)).fetchone()
+        freeze, timezone, closed_daily, closed_weekly = row or (0, DEFAULT_TIMEZONE, None, None)
+        profile = {
+            "daily-streaks": {},
+            "weekly-streaks": {},
+            "daily-groups": {},
+            "weekly-groups": {},
+            "master-count": 0,
+            "freeze": freeze,
+            "timezone": timezone,
+            "closed": {kind: closed for kind, closed in ((DAILY, closed_daily), (WEEKLY, closed_weekly)) if closed},
+        }
+        rows = self._conn.execute(
+            f"SELECT kind, name, daily, aim, {', '.join(STATS_COLUMNS)} FROM streaks "
+            "WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id))
+        for kind, name, daily, aim, history, *stats in rows:
+            details = {"daily": daily, "aim": aim}
+            analytics.store_stats(details, (analytics.history_from_blob(history), *stats))
+            profile[f"{kind}-streaks"][name] = details
+        rows = self._conn.execute(
+            "SELECT kind, name, members FROM streak_groups WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id))
+        for kind, name, members in rows:
+            profile[f"{kind}-groups"][name] = json.loads(members)
+        profile["master-count"] = len(profile["daily-streaks"])
+        return profile
+
+    async def timezones(self):
+        # New profiles start in the default zone, so it is always scheduled
+        rows = await self._run(
+            lambda: self._conn.execute("SELECT DISTINCT timezone FROM profiles").fetchall())
+        return sorted({DEFAULT_TIMEZONE, *(timezone for timezone, in rows)})
+
+    async def last_runs(self):
+        rows = await self._run(
+            lambda: self._conn.execute("SELECT job, last_run FROM schedule").fetchall())
+        return dict(rows)
+
+    async def freeze(self, guild_id, user_id):
+        profile = await self.profile(guild_id, user_id)
+        return profile["freeze"]
+
+    # --------MUTATIONS--------
+    @staticmethod
+    def _done(conn, guild_id, user_id, category, kind):
+        cursor = conn.execute(
+            "UPDATE streaks SET daily = daily + 1 "
+            "WHERE guild_id = ? AND user_id = ? AND kind = ? AND name = ? AND daily < aim",
+            (guild_id, user_id, kind, category))
+        if cursor.rowcount:
+            return DONE_UPDATED
+        exists = conn.execute(
+            "SELECT 1 FROM streaks WHERE guild_id = ? AND user_id = ? AND kind = ? AND name = ?",
+            (guild_id, user_id, kind, category)).fetchone()
+        return DONE_ALREADY if exists else DONE_MISSING
+
+    async def done_many(self, guild_id, user_id, categories, kind=DAILY):
+        """Mark several streaks done in one transaction; nothing is applied if any is missing."""
+        results = await self._run(self._write, self._done_many, guild_id, user_id, list(categories), kind)
+        if DONE_UPDATED in results.values():
+            self._mutated(guild_id, user_id)
+        return results
+
+    @staticmethod
+    def _done_many(conn, guild_id, user_id, categories, kind):
+        if len(categories) == 1:
+            # A lone streak needs no validation pass, the guarded UPDATE decides
+            return {categories[0]: SqliteStreakStore._done(conn, guild_id, user_id, categories[0], kind)}
+        rows = conn.execute(
+            f"SELECT name, daily, aim FROM streaks WHERE guild_id = ? AND user_id = ? AND kind = ? "
+            f"AND name IN ({', '.join('?' * len(categories))})",
+            (guild_id, user_id, kind, *categories)).fetchall()
+        found = {name: daily < aim for name, daily, aim in rows}
+        results = {category: DONE_MISSING if category not in found
+                   else DONE_UPDATED if found[category] else DONE_ALREADY
+                   for category in categories}
+        if DONE_MISSING not in results.values():
+            conn.executemany(
+                "UPDATE streaks SET daily = daily + 1 "
+                "WHERE guild_id = ? AND user_id = ? AND kind = ? AND name = ?",
+                [(guild_id, user_id, kind, category)
+                 for category, result in results.items() if result == DONE_UPDATED])
+        return results
+
+    async def add_many(self, guild_id, user_id, categories, kind=DAILY):
+        """Add the streaks not tracked yet in one transaction; returns the names that were added."""
+        added = await self._run(self._write, self._add_many, guild_id, user_id, list(dict.fromkeys(categories)), kind)
+        if added:
+            self._mutated(guild_id, user_id)
+        return added
+
+    @staticmethod
+    def _add_many(conn, guild_id, user_id, categories, kind):
+        conn.execute("INSERT OR IGNORE INTO profiles (guild_id, user_id) VALUES (?, ?)",
+                     (guild_id, user_id))
+        added = []
+        for category in categories:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO streaks (guild_id, user_id, kind, name) VALUES (?, ?, ?, ?)",
+                (guild_id, user_id, kind, category))
+            if cursor.rowcount:
+                added.append(category)
+        return added
+
+    async def remove_many(self, guild_id, user_id, categories, kind=DAILY):
+        """Remove several streaks in one transaction; nothing is removed if any is missing."""
+        results = await self._run(self._write, self._remove_many, guild_id, user_id, list(categories), kind)
+        if all(results.values()):
+            self._mutated(guild_id, user_id)
+        return results
+
+    @staticmethod
+    def _remove_many(conn, guild_id, user_id, categories, kind):
+        rows = conn.execute(
+            f"SELECT name FROM streaks WHERE guild_id = ? AND user_id = ? AND kind = ? "
+            f"AND name IN ({', '.join('?' * len(categories))})",
+            (guild_id, user_id, kind, *categories)).fetchall()
+        found = {name for name, in rows}
+        results = {category: category in found for category in categories}
+        if all(results.values()):
+            conn.executemany(
+                "DELETE FROM streaks WHERE guild_id = ? AND user_id = ? AND kind = ? AND name = ?",
+                [(guild_id, user_id, kind, category) for category in results])
+        return results
+
+    async def set_group(self, guild_id, user_id, name, members, kind=DAILY):
+        await self._run(self._write, self._set_group, guild_id, user_id, name, list(members), kind)
+        self._mutated(guild_id, user_id)
+
+    @staticmethod
+    def _set_group(conn, guild_id, user_id, name, members, kind):
+        if members:
+            conn.execute(
+                "INSERT OR REPLACE INTO streak_groups (guild_id, user_id, kind, name, members) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (guild_id, user_id, kind, name, json.dumps(members)))
+        else:
+            conn.execute(
+                "DELETE FROM streak_groups WHERE guild_id = ? AND user_id = ? AND kind = ? AND name = ?",
+                (guild_id, user_id, kind, name))
+
+    async def add_freeze(self, guild_id, user_id, amount=1):
+        await self._run(self._write, self._add_freeze, guild_id, user_id, amount)
+        self._mutated(guild_id, user_id)
+
+    @staticmethod
+    def _add_freeze(conn, guild_id, user_id, amount):
+        conn.execute(
+            "INSERT INTO profiles (guild_id, user_id, freeze) VALUES (?, ?, ?) "
+            "ON CONFLICT (guild_id, user_id) DO UPDATE SET freeze = freeze + excluded.freeze",
+            (guild_id, user_id, amount))
+
+    async def set_timezone(self, guild_id, user_id, timezone):
+        await self._run(self._write, self._set_timezone, guild_id, user_id, timezone)
+        self._mutated(guild_id, user_id)
+
+    @staticmethod
+    def _set_timezone(conn, guild_id, user_id, timezone):
+        conn.execute(
+            "INSERT INTO profiles (guild_id, user_id, timezone) VALUES (?, ?, ?) "
+            "ON CONFLICT (guild_id, user_id) DO UPDATE SET timezone = excluded.timezone",
+            (guild_id, user_id, timezone))
+
+    async def record_run(self, job, when):
+        await self._run(self._write, self._record_run, job, when.isoformat())
+
+    @staticmethod
+    def _record_run(conn, job, when):
+        conn.execute("INSERT OR REPLACE INTO schedule (job, last_run) VALUES (?, ?)", (job, when))
+
+    async def roll_over(self, rng=None, kind=DAILY, timezone=None, period=None, job=None, when=None):
+        """Close ``period`` for the profiles in ``timezone`` that have not closed it yet.
+
+        When ``job`` is given its schedule row is written in the same
+        transaction, so a crash can never leave a rollover without its marker.
+        """
+        result = await self._run(self._write, self._roll_over, rng, kind, timezone, period,
+                                 job, when.isoformat() if when else None)
+        self._mutated()
+        return result
+
+    @staticmethod
+    def _roll_over(conn, rng, kind, timezone, period, job, when):
+        # One transaction, so no !done can slip in between the counts and the
+        # updates. Only the per-profile freeze rules run in Python; the
+        # per-streak changes are a single set-based UPDATE.
+        closed = f"closed_{kind}"
+        conditions = []
+        params = []
+        if timezone is not None:
+            conditions.append("p.timezone = ?")
+            params.append(timezone)
+        if period is not None:
+            conditions.append(f"(p.{closed} IS NULL OR p.{closed} < ?)")
+            params.append(period)
+        where = "".join(f" AND {condition}" for condition in conditions)
+        # Streak names never contain whitespace (commands split on it), so a
+        # space-joined list is a safe and cheap way to bring them back.
+        rows = conn.execute(
+            "SELECT s.guild_id, s.user_id, p.freeze, count(*), sum(s.daily != s.aim), "
+            "group_concat(CASE WHEN s.daily = s.aim THEN s.name END, ' '), "
+            "group_concat(CASE WHEN s.daily != s.aim THEN s.name END, ' ') "
+            "FROM streaks s JOIN profiles p ON p.guild_id = s.guild_id AND p.user_id = s.user_id "
+            f"WHERE s.kind = ?{where} GROUP BY s.guild_id, s.user_id",
+            (kind, *params)).fetchall()
+        freeze = [row[2] for row in rows]
+        covered, spent, earned, new_freeze, extinguished = rollover.owner_rules(
+            freeze, [row[3] for row in rows], [row[4] for row in rows], rng, freezes=kind == DAILY)
+
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS rollover_covered "
+                     "(guild_id INTEGER, user_id INTEGER, PRIMARY KEY (guild_id, user_id)) WITHOUT ROWID")
+        conn.execute("DELETE FROM rollover_covered")
+        conn.executemany("INSERT INTO rollover_covered VALUES (?, ?)",
+                         [row[:2] for row, cover in zip(rows, covered) if cover])
+        scope = f"SELECT p.guild_id, p.user_id FROM profiles p WHERE 1{where}"
+        done = "(daily = aim)"
+        held = "(guild_id, user_id) IN rollover_covered"
+        conn.execute(
+            "UPDATE streaks SET "
+            f"history = roll_history(history, {done}), "
+            f"longest = CASE WHEN {done} AND daily > longest THEN daily ELSE longest END, "
+            + "".join(f"done{window} = done{window} + {done} - {history_bit('history', window - 1)}, "
+                      for window in analytics.WINDOWS)
+            + f"days = min(days + 1, {analytics.HISTORY_BITS}), "
+            f"aim = CASE WHEN {done} THEN aim + 1 WHEN {held} THEN aim ELSE 1 END, "
+            f"daily = CASE WHEN {done} OR {held} THEN daily ELSE 0 END "
+            "WHERE kind = ?" + (f" AND (guild_id, user_id) IN ({scope})" if where else ""),
+            (kind, *params))
+        conn.executemany(
+            "UPDATE profiles SET freeze = ? WHERE guild_id = ? AND user_id = ?",
+            [(have, *row[:2]) for row, have, before in zip(rows, new_freeze, freeze) if have != before])
+        if period is not None:
+            conn.execute(f"UPDATE profiles AS p SET {closed} = ? WHERE 1{where}", (period, *params))
+        if job is not None:
+            SqliteStreakStore._record_run(conn, job, when)
+
+        reports = [
+            rollover.OwnerReport(guild_id, user_id, completed.split(" ") if completed else [],
+                                 [] if cover or not missing else missing.split(" "),
+                                 missed, use, gain, have, out)
+            for (guild_id, user_id, _, _, missed, completed, missing), cover, use, gain, have, out
+            in zip(rows, covered, spent, earned, new_freeze, extinguished)
+        ]
+        # The per-streak columns never leave the database
+        return rollover.RolloverResult([], [], [], new_freeze, reports)
+
+    @staticmethod
+    def _put_profile(conn, guild_id, user_id, profile):
+        conn.execute(
+            "INSERT INTO profiles (guild_id, user_id, freeze, timezone, closed_daily, closed_weekly) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (guild_id, user_id) DO UPDATE "
+            "SET freeze = excluded.freeze, timezone = excluded.timezone, "
+            "closed_daily = excluded.closed_daily, closed_weekly = excluded.closed_weekly",
+            (guild_id, user_id, profile.get("freeze", 0), profile.get("timezone", DEFAULT_TIMEZONE),
+             profile.get("closed", {}).get(DAILY), profile.get("closed", {}).get(WEEKLY)))
+        conn.execute("DELETE FROM streaks WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+        for kind in (DAILY, WEEKLY):
+            rows = []
+            for name, info in profile.get(f"{kind}-streaks", {}).items():
+                history, *counts = analytics.stats_of(info)
+                rows.append((guild_id, user_id, kind, name, info["daily"], info["aim"],
+                             analytics.history_to_blob(history), *counts))
+            conn.executemany(
+                f"INSERT INTO streaks (guild_id, user_id, kind, name, daily, aim, {', '.join(STATS_COLUMNS)}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows)
+            conn.execute("DELETE FROM streak_groups WHERE guild_id = ? AND user_id = ? AND kind = ?",
+                         (guild_id, user_id, kind))
+            conn.executemany(
+                "INSERT INTO streak_groups (guild_id, user_id, kind, name, members) VALUES (?, ?, ?, ?, ?)",
+                [(guild_id, user_id, kind, name, json.dumps(members))
+                 for name, members in profile.get(f"{kind}-groups", {}).items()])
+
+    # --------LIFECYCLE--------
+    async def flush(self):
+        # Every mutation commits its own transaction, nothing is buffered.
+        pass
+
+    def save(self):
+        if self._conn is not None:
+            self._executor.submit(self._conn.close).result()
+            self._conn = None
+        self._executor.shutdown(wait=True)
+
+
+# ------------JSON MIGRATION------------
+def migrate_json(json_path, db_path, guild_id, user_id):
+    """Copy a legacy streaks.json, plus its journal, into the database as one (guild, user) profile."""
+    profile, _, _ = read_state(json_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        upgrade_schema(conn)
+        with conn:
+            SqliteStreakStore._put_profile(conn, guild_id, user_id, profile)
+    finally:
+        conn.close()
+    return len(profile.get("daily-streaks", {})) + len(profile.get("weekly-streaks", {}))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Migrate streaks.json into a SQLite database.")
+    parser.add_argument("json_path")
+    parser.add_argument("db_path")
+    parser.add_argument("guild_id", type=int)
+    parser.add_argument("user_id", type=int)
+    args = parser.parse_args()
+    migrated = migrate_json(args.json_path, args.db_path, args.guild_id, args.user_id)
+    print(f"Migrated {migrated} streaks into {args.db_path}")
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import os
+
+import analytics
+import rollover
+from atomic_file import atomic_write
+from journal import Journal, apply_event, replay
+from metrics import registry
+
+DONE_UPDATED = "updated"
+DONE_ALREADY = "already"
+DONE_MISSING = "missing"
+
+DAILY = "daily"
+WEEKLY = "weekly"
+DEFAULT_TIMEZONE = "America/New_York"
+
+
+# ------------SNAPSHOT AND JOURNAL------------
+def journal_path(path):
+    return os.path.splitext(path)[0] + ".journal"
+
+
+def read_state(path):
+    """Read the snapshot at ``path`` and replay its journal, without changing either file.
+
+    Returns the state, the seq the snapshot covers and the last seq replayed.
+    """
+    with open(path, "r") as file:
+        state = json.load(file)
+    state.setdefault("daily-streaks", {})
+    state.setdefault("weekly-streaks", {})
+    state.setdefault("daily-groups", {})
+    state.setdefault("weekly-groups", {})
+    state.setdefault("master-count", len(state["daily-streaks"]))
+    state.setdefault("freeze", 0)
+    state.setdefault("schedule", {})
+    snapshot_seq = state.pop("journal-seq", 0)
+    return state, snapshot_seq, replay(state, [journal_path(path)], snapshot_seq)
+
+
+# ------------IN-MEMORY STREAK STORE------------
+class StreakStore:
+    """Keeps streaks.json in memory and journals every change behind the commands.
+
+    Mutations are applied as events (see journal.py) and appended to
+    ``<name>.journal``; one flush ``flush_delay`` seconds after the first
+    change appends the whole burst with a single fsync. Once the journal
+    holds ``compact_every`` events it is folded into a new streaks.json
+    snapshot. Loading reads the snapshot and replays the journal after it.
+
+    The file holds a single profile, so the guild/user arguments shared with
+    SqliteStreakStore are accepted and ignored.
+    """
+
+    def __init__(self, path, flush_delay=2.0, compact_every=1000):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.compact_every = compact_every
+        self.journal = Journal(journal_path(path))
+        self.data = {}
+        self.version = 0
+        self.writes = 0
+        self._flush_task = None
+        self._write_lock = asyncio.Lock()
+
+    def load(self):
+        self.journal.repair()
+        self.data, snapshot_seq, self.journal.seq = read_state(self.path)
+        self.journal.size = self.journal.seq - snapshot_seq
+
+    # --------READS--------
+    async def profile(self, guild_id, user_id):
+        return self.data
+
+    def cache_token(self, guild_id, user_id):
+        return self.version
+
+    async def timezones(self):
+        return [self.data.get("timezone", DEFAULT_TIMEZONE)]
+
+    async def last_runs(self):
+        return dict(self.data["schedule"])
+
+    async def freeze(self, guild_id, user_id):
+        return self.data["freeze"]
+
+    # --------MUTATIONS--------
+    def _apply(self, event):
+        apply_event(self.data, event)
+        self.journal.append(event)
+        self.mark_dirty()
+
+    def _apply_batch(self, events):
+        # A batch is journalled as one line, so a crash never leaves half of it applied
+        if len(events) == 1:
+            self._apply(events[0])
+        elif events:
+            self._apply({"type": "batch", "events": events})
+
+    async def done_many(self, guild_id, user_id, categories, kind=DAILY):
+        """Mark several streaks done at once; nothing is applied if any of them is missing."""
+        streaks = self.data[f"{kind}-streaks"]
+        results = {}
+        for category in categories:
+            details = streaks.get(category)
+            if details is None:
+                results[category] = DONE_MISSING
+            elif details["daily"] >= details["aim"]:
+                results[category] = DONE_ALREADY
+            else:
+                results[category] = DONE_UPDATED
+        if DONE_MISSING not in results.values():
+            self._apply_batch([{"type": "done", "kind": kind, "name": category}
+                               for category, result in results.items() if result == DONE_UPDATED])
+        return results
+
+    async def add_many(self, guild_id, user_id, categories, kind=DAILY):
+        """Add the streaks not tracked yet; returns the names that were added."""
+        streaks = self.data[f"{kind}-streaks"]
+        added = [category for category in dict.fromkeys(categories) if category not in streaks]
+        self._apply_batch([{"type": "add", "kind": kind, "name": category} for category in added])
+        return added
+
+    async def remove_many(self, guild_id, user_id, categories, kind=DAILY):
+        """Remove several streaks at once; nothing is removed if any of them is missing."""
+        streaks = self.data[f"{kind}-streaks"]
+        results = {category: category in streaks for category in categories}
+        if all(results.values()):
+            self._apply_batch([{"type": "remove", "kind": kind, "name": category} for category in results])
+        return results
+
+    async def set_group(self, guild_id, user_id, name, members, kind=DAILY):
+        self._apply({"type": "group", "kind": kind, "name": name, "members": list(members)})
+
+    async def add_freeze(self, guild_id, user_id, amount=1):
+        self._apply({"type": "freeze-earned", "amount": amount})
+
+    async def set_timezone(self, guild_id, user_id, timezone):
+        self._apply({"type": "timezone", "timezone": timezone})
+
+    async def record_run(self, job, when):
+        self._apply({"type": "schedule-run", "job": job, "when": when.isoformat()})
+
+    async def roll_over(self, rng=None, kind=DAILY, timezone=None, period=None, job=None, when=None):
+        closed = self.data.get("closed", {}).get(kind)
+        if ((timezone is not None and timezone != self.data.get("timezone", DEFAULT_TIMEZONE))
+                or (period is not None and closed is not None and closed >= period)):
+            return rollover.roll_over(rollover.RolloverBatch(), rng)
+        streaks = self.data[f"{kind}-streaks"]
+        batch = rollover.collect(
+            [(None, None, self.data["freeze"])],
+            [(None, None, name, info["daily"], info["aim"], analytics.stats_of(info))
+             for name, info in streaks.items()])
+        result = rollover.roll_over(batch, rng, freezes=kind == DAILY)
+        # The events reproduce the engine's output when applied in this order
+        # and go out as one batch, so a crash never leaves a half-rolled day.
+        events = []
+        for report in result.reports:
+            events.extend({"type": "reset", "kind": kind, "name": name} for name in report.reset)
+        events.append({"type": "rollover", "kind": kind, "period": period})
+        for report in result.reports:
+            if report.freeze_spent:
+                events.append({"type": "freeze-spent", "amount": report.freeze_spent})
+            if report.freeze_earned:
+                events.append({"type": "freeze-earned", "amount": report.freeze_earned})
+        if job is not None:
+            events.append({"type": "schedule-run", "job": job, "when": when.isoformat()})
+        self._apply_batch(events)
+        return result
+
+    def mark_dirty(self):
+        self.version += 1
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+            except RuntimeError:
+                # No loop running (startup/shutdown), write straight away.
+                self.save()
+
+    # --------PERSISTENCE--------
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        # Mutations made while this write is in flight schedule the next one.
+        self._flush_task = None
+        await self.flush()
+
+    def _snapshot(self):
+        return json.dumps({**self.data, "journal-seq": self.journal.seq}, indent=4), self.journal.seq
+
+    async def flush(self):
+        async with self._write_lock:
+            lines = self.journal.take_pending()
+            if lines:
+                with registry.timer("storage.write"):
+                    await asyncio.to_thread(self.journal.write_lines, lines)
+                self.writes += 1
+            if self.journal.size >= self.compact_every:
+                await self.compact()
+
+    async def compact(self):
+        # Serialise on the loop so the snapshot is consistent, write off it.
+        text, seq = self._snapshot()
+        with registry.timer("storage.compact"):
+            await asyncio.to_thread(atomic_write, self.path, text)
+            await asyncio.to_thread(self.journal.rotate, seq)
+        self.writes += 1
+
+    def save(self):
+        lines = self.journal.take_pending()
+        if lines:
+            self.journal.write_lines(lines)
+            self.writes += 1
+        if self.journal.size:
+            text, seq = self._snapshot()
+            with registry.timer("storage.compact"):
+                atomic_write(self.path, text)
+                self.journal.rotate(seq)
+            self.writes += 1
+
+    async def close(self):
+        await self.flush()
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
@@ -0,0 +1,25 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The bot's modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    """An empty, loaded store of each backend."""
+    from sqlite_store import SqliteStreakStore
+    from store import StreakStore
+
+    if request.param == "sqlite":
+        store = SqliteStreakStore(str(tmp_path / "streaks.db"))
+    else:
+        path = tmp_path / "streaks.json"
+        path.write_text(json.dumps({"daily-streaks": {}, "weekly-streaks": {}, "master-count": 0, "freeze": 0}))
+        store = StreakStore(str(path))
+    store.load()
+    yield store
+    store.save()
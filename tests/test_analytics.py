@@ -0,0 +1,16 @@
+import datetime
+
+import analytics
+
+
+def test_last_closed_day_is_the_day_before_the_closed_period():
+    assert analytics.last_closed_day("2024-05-21", "Asia/Tokyo", 7, 47) == datetime.date(2024, 5, 20)
+
+
+def test_heatmap_puts_bit_zero_on_the_last_closed_day():
+    # Only the day before the last closed one was done; 2024-05-20 is a Monday
+    details = {"history": 0b10, "days": 2}
+    rows = analytics.heatmap_message("run", details, datetime.date(2024, 5, 20)).split("\n")
+    monday, sunday = rows[2], rows[8]
+    assert monday.startswith("M") and monday.endswith("·░")
+    assert sunday.startswith("S") and sunday.endswith("█·")
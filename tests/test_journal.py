@@ -0,0 +1,115 @@
+import asyncio
+import json
+import random
+
+import journal
+from sqlite_store import SqliteStreakStore, migrate_json
+from store import StreakStore
+
+EMPTY_PROFILE = {"daily-streaks": {}, "weekly-streaks": {}, "master-count": 0, "freeze": 0}
+
+
+def new_store(tmp_path, **kwargs):
+    path = tmp_path / "streaks.json"
+    path.write_text(json.dumps(EMPTY_PROFILE))
+    store = StreakStore(str(path), flush_delay=0, **kwargs)
+    store.load()
+    return store
+
+
+async def play_a_few_days(store):
+    await store.add_many(0, 0, ["leetcode", "exercise", "piano"])
+    await store.set_group(0, 0, "morning", ["leetcode", "exercise"])
+    rng = random.Random(3)
+    for day in range(6):
+        await store.done_many(0, 0, ["leetcode", "exercise"] if day % 2 else ["leetcode"])
+        await store.roll_over(rng)
+    await store.remove_many(0, 0, ["piano"])
+    await store.flush()
+
+
+def test_replaying_the_journal_matches_live_state(tmp_path):
+    store = new_store(tmp_path)
+    asyncio.run(play_a_few_days(store))
+    reloaded = StreakStore(store.path)
+    reloaded.load()
+    assert reloaded.data == store.data
+    assert reloaded.journal.seq == store.journal.seq
+
+
+def test_rollover_is_one_journal_line(tmp_path):
+    store = new_store(tmp_path)
+
+    async def scenario():
+        await store.add_many(0, 0, ["leetcode", "exercise"])
+        await store.flush()
+        before = store.journal.seq
+        await store.roll_over(random.Random(0))
+        await store.flush()
+        return before
+
+    before = asyncio.run(scenario())
+    assert store.journal.seq == before + 1
+
+
+def test_repair_cuts_a_torn_last_line(tmp_path):
+    path = tmp_path / "streaks.journal"
+    good = json.dumps({"seq": 1, "ts": "2024-01-01T00:00:00+00:00", "type": "freeze-earned", "amount": 1})
+    path.write_text(good + "\n" + '{"seq": 2, "ts": "2024-01-01T0')
+    log = journal.Journal(str(path))
+    log.repair()
+    assert path.read_text() == good + "\n"
+    log.seq = 1
+    log.append({"type": "freeze-earned", "amount": 2})
+    log.write_lines(log.take_pending())
+    assert [event["seq"] for event in journal.read_events(str(path))] == [1, 2]
+
+
+def test_replay_skips_events_the_snapshot_covers(tmp_path):
+    path = tmp_path / "streaks.journal"
+    path.write_text("".join(
+        json.dumps({"seq": seq, "ts": "2024-01-01T00:00:00+00:00", "type": "freeze-earned", "amount": seq}) + "\n"
+        for seq in (1, 2, 3)))
+    state = dict(EMPTY_PROFILE)
+    assert journal.replay(state, [str(path)], after_seq=2) == 3
+    assert state["freeze"] == 3
+
+
+def test_compaction_rotates_and_reload_skips_covered_events(tmp_path):
+    store = new_store(tmp_path, compact_every=5)
+    asyncio.run(play_a_few_days(store))
+    with open(store.path) as file:
+        snapshot = json.load(file)
+    assert snapshot["journal-seq"] > 0
+    assert list(tmp_path.glob("streaks.journal.*"))
+    assert store.journal.size < 5
+    reloaded = StreakStore(store.path)
+    reloaded.load()
+    assert reloaded.data == store.data
+
+
+def test_migrate_json_includes_journalled_changes(tmp_path):
+    store = new_store(tmp_path)
+
+    async def scenario():
+        await store.add_many(0, 0, ["leetcode"])
+        store.save()
+        await store.add_many(0, 0, ["piano", "run"])
+        await store.done_many(0, 0, ["piano"])
+        await store.flush()
+
+    asyncio.run(scenario())
+    db_path = str(tmp_path / "streaks.db")
+    assert migrate_json(store.path, db_path, 1, 2) == 3
+
+    async def read_back():
+        sqlite_store = SqliteStreakStore(db_path)
+        sqlite_store.load()
+        try:
+            return await sqlite_store.profile(1, 2)
+        finally:
+            sqlite_store.save()
+
+    streaks = asyncio.run(read_back())["daily-streaks"]
+    assert sorted(streaks) == ["leetcode", "piano", "run"]
+    assert streaks["piano"]["daily"] == 1
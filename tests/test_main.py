@@ -0,0 +1,128 @@
+import asyncio
+import os
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+from discord.ext import commands
+
+# main reads its configuration at import time
+WORKDIR = tempfile.mkdtemp()
+os.environ.update({
+    "ALLOWED_CHANNEL_ID_DAILY": "101",
+    "ALLOWED_CHANNEL_ID_WEEKLY": "102",
+    "STREAK_CHANNELS": "7:201:202,8:301:",
+    "MESSAGES_FILE": os.path.join(WORKDIR, "messages.json"),
+    "METRICS_FILE": os.path.join(WORKDIR, "metrics.json"),
+    "STREAKS_JSON": os.path.join(WORKDIR, "streaks.json"),
+})
+os.environ.pop("STREAKS_DB", None)
+os.environ.pop("SLASH_COMMANDS", None)
+
+import main  # noqa: E402
+from fake_discord import FakeDiscord  # noqa: E402
+from message_index import MessageIndex  # noqa: E402
+from outbox import MESSAGE_LIMIT, compose  # noqa: E402
+from render_cache import RenderCache  # noqa: E402
+from rollover import OwnerReport  # noqa: E402
+
+
+class Interaction:
+    """A context as a slash command sees it, recording the replies."""
+
+    def __init__(self):
+        self.interaction = object()
+        self.replies = []
+
+    async def send(self, content=None, **kwargs):
+        self.replies.append((content, kwargs.get("ephemeral")))
+
+
+def test_channel_check_raises_its_own_failure():
+    check = main.in_streak_channel
+    assert asyncio.run(check(SimpleNamespace(channel=SimpleNamespace(id=201))))
+    with pytest.raises(main.NotStreakChannel):
+        asyncio.run(check(SimpleNamespace(channel=SimpleNamespace(id=555))))
+
+
+def test_only_the_channel_check_gets_the_channels_reply():
+    off_channel = Interaction()
+    asyncio.run(main.on_command_error(off_channel, main.NotStreakChannel()))
+    not_admin = Interaction()
+    asyncio.run(main.on_command_error(not_admin, commands.MissingPermissions(["administrator"])))
+    assert off_channel.replies == [("Streak commands only work in the streak channels.", True)]
+    assert len(not_admin.replies) == 1 and "permission" in not_admin.replies[0][0]
+
+
+def test_group_expansion_skips_untracked_members(store, monkeypatch):
+    monkeypatch.setattr(main, "store", store)
+    ctx = SimpleNamespace(guild=SimpleNamespace(id=7), author=SimpleNamespace(id=2))
+
+    async def scenario():
+        await store.add_many(7, 2, ["run", "read", "stretch"])
+        await store.set_group(7, 2, "morning", ["run", "stretch", "meditate"])
+        await store.remove_many(7, 2, ["stretch"])
+        tracked = await main.expand_groups(ctx, main.DAILY, ["read", "@morning", "run", "@evening"], True)
+        every = await main.expand_groups(ctx, main.DAILY, ["@morning"], False)
+        return tracked, every
+
+    tracked, every = asyncio.run(scenario())
+    assert tracked == (["read", "run"], ["@evening"])
+    assert every == (["run", "stretch", "meditate"], [])
+
+
+def test_thirty_streak_reset_report_fits_in_two_messages():
+    names = [f"streak-number-{n:02}" for n in range(30)]
+    report = OwnerReport(7, 2, [], names, 30, 0, 0, 0, True)
+    messages = compose(main.morning_report_parts(report, 1000))
+    assert 1 <= len(messages) <= 2
+    assert all(len(message) <= MESSAGE_LIMIT for message in messages)
+    assert all(f"{name} has been reset" in "".join(messages) for name in names)
+
+
+def test_parse_channels_reads_per_guild_overrides():
+    assert main.parse_channels("7:201:202,8:301:") == {
+        None: {main.DAILY: 101, main.WEEKLY: 102},
+        7: {main.DAILY: 201, main.WEEKLY: 202},
+        8: {main.DAILY: 301, main.WEEKLY: 0},
+    }
+    assert main.CHANNEL_KINDS == {101: main.DAILY, 102: main.WEEKLY, 201: main.DAILY,
+                                  202: main.WEEKLY, 301: main.DAILY}
+
+
+def test_prefilter_drops_chatter_and_only_tracks_bot_messages(store, monkeypatch):
+    monkeypatch.setattr(main, "store", store)
+    monkeypatch.setattr(main, "renders", RenderCache(store))
+    monkeypatch.setattr(main, "messages", MessageIndex())
+    processed = []
+    process_commands = main.bot.process_commands
+
+    async def recording_process_commands(message):
+        processed.append(message.content)
+        await process_commands(message)
+
+    monkeypatch.setattr(main.bot, "process_commands", recording_process_commands)
+
+    async def scenario():
+        discord_ = FakeDiscord(main.bot, main.on_message, guild_id=7)
+        await discord_.connect()
+        user = discord_.user(2)
+        off_channel = await discord_.message(555, user, "!add run")
+        no_prefix = await discord_.message(201, user, "add run")
+        from_bot = await discord_.message(201, discord_.bot_user, "!add swim")
+        tracked_before = main.messages.take(201)
+        command = await discord_.message(201, user, "!add read")
+        tracked_after = main.messages.take(201)
+        profile = await store.profile(7, 2)
+        return (off_channel, no_prefix, from_bot, command, tracked_before, tracked_after,
+                sorted(profile["daily-streaks"]), discord_.rest.calls)
+
+    (off_channel, no_prefix, from_bot, command, tracked_before, tracked_after,
+     tracked_streaks, calls) = asyncio.run(scenario())
+    assert processed == ["!add read"]
+    assert tracked_before == [from_bot.id]
+    # The command and the bot's echoed reply
+    assert command.id in tracked_after and len(tracked_after) == 2
+    assert off_channel.id not in tracked_after and no_prefix.id not in tracked_after
+    assert tracked_streaks == ["read"]
+    assert calls == {"send_message": 1}
@@ -0,0 +1,62 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import discord
+
+from fake_discord import DISCORD_EPOCH_MS, FakeChannel, FakeGuild, FakeREST, FakeUser
+from message_index import MessageIndex
+
+
+def old_snowflake(days):
+    return (int(time.time() * 1000) - days * 86400000 - DISCORD_EPOCH_MS) << 22
+
+
+def new_channel():
+    return FakeChannel(1, FakeGuild(1), FakeREST(), FakeUser(999, bot=True))
+
+
+def test_recent_messages_go_in_bulk_and_old_ones_singly():
+    async def scenario():
+        channel = new_channel()
+        index = MessageIndex()
+        index.track(channel.id, old_snowflake(20))
+        for _ in range(150):
+            index.track(channel.id, (await channel.send("hi")).id)
+        return await index.clean(channel), channel.rest.calls, len(index)
+
+    deleted, calls, left = asyncio.run(scenario())
+    assert deleted == 151
+    assert calls["bulk_delete"] == 2
+    assert calls["delete_message"] == 1
+    assert left == 0
+
+
+def test_failed_single_deletes_are_kept_for_the_next_cleanup():
+    class ForbiddenChannel(FakeChannel):
+        def get_partial_message(self, message_id):
+            async def delete():
+                raise discord.Forbidden(SimpleNamespace(status=403, reason="Forbidden"), "Missing Permissions")
+            return SimpleNamespace(delete=delete)
+
+    async def scenario():
+        channel = ForbiddenChannel(1, FakeGuild(1), FakeREST(), FakeUser(999, bot=True))
+        index = MessageIndex()
+        stale = [old_snowflake(20), old_snowflake(30)]
+        for message_id in stale:
+            index.track(channel.id, message_id)
+        return await index.clean(channel), index.take(channel.id), stale
+
+    deleted, kept, stale = asyncio.run(scenario())
+    assert deleted == 0
+    assert sorted(kept) == sorted(stale)
+
+
+def test_flush_writes_a_snapshot_taken_on_the_loop(tmp_path):
+    path = tmp_path / "messages.json"
+    index = MessageIndex(str(path), max_per_channel=2)
+    for message_id in (1, 2, 3):
+        index.track(7, message_id)
+    asyncio.run(index.flush())
+    assert json.loads(path.read_text()) == {"7": [2, 3]}
@@ -0,0 +1,28 @@
+from outbox import FENCE, compose
+
+
+def test_parts_pack_in_order_and_skip_empty_ones():
+    assert compose(["one", "", "two", None, "three"], limit=9) == ["one\ntwo", "three"]
+
+
+def test_long_lines_are_split_to_fit():
+    messages = compose(["x" * 25], limit=10)
+    assert messages == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_oversized_code_block_is_refenced_per_message():
+    block = FENCE + "\n" + "\n".join(f"line {n:02}" for n in range(12)) + FENCE
+    messages = compose([block], limit=40)
+    assert len(messages) > 1
+    for message in messages:
+        assert len(message) <= 40
+        assert message.startswith(FENCE + "\nline ") and message.endswith(FENCE)
+    lines = [line for message in messages for line in message[len(FENCE):-len(FENCE)].split("\n") if line]
+    assert lines == [f"line {n:02}" for n in range(12)]
+
+
+def test_block_without_leading_newline_keeps_its_lines():
+    block = FENCE + "\n".join(f"row {n}" for n in range(10)) + FENCE
+    messages = compose([block], limit=30)
+    assert all(len(message) <= 30 and message.startswith(FENCE + "row ") for message in messages)
+    assert "\n".join(message[len(FENCE):-len(FENCE)] for message in messages) == block[len(FENCE):-len(FENCE)]
@@ -0,0 +1,66 @@
+import asyncio
+
+from render_cache import RenderCache
+from sqlite_store import SqliteStreakStore
+
+
+def counting_render(counts, name):
+    def render(profile):
+        counts[name] = counts.get(name, 0) + 1
+        return f"{name}: {sorted(profile['daily-streaks'])}"
+    return render
+
+
+def test_sqlite_done_only_invalidates_its_own_profile_and_rollover_everything(tmp_path):
+    async def scenario():
+        store = SqliteStreakStore(str(tmp_path / "streaks.db"))
+        store.load()
+        cache = RenderCache(store)
+        renders = {}
+        for user in (2, 3):
+            await store.add_many(1, user, ["run"])
+
+        async def view_both():
+            for user in (2, 3):
+                await cache.get("summary", 1, user, counting_render(renders, user))
+
+        await view_both()
+        await view_both()
+        after_reads = dict(renders)
+        await store.done_many(1, 2, ["run"])
+        await view_both()
+        after_done = dict(renders)
+        await store.roll_over(period="2024-05-21")
+        await view_both()
+        store.save()
+        return after_reads, after_done, renders, cache.hits
+
+    after_reads, after_done, after_rollover, hits = asyncio.run(scenario())
+    assert after_reads == {2: 1, 3: 1}
+    assert after_done == {2: 2, 3: 1}
+    assert after_rollover == {2: 3, 3: 2}
+    assert hits == 3
+
+
+def test_render_is_not_kept_when_the_token_moves_underneath(store):
+    async def scenario():
+        await store.add_many(1, 2, ["run"])
+        cache = RenderCache(store)
+        renders = {}
+
+        def render_during_a_write(profile):
+            # A mutation lands between reading the profile and caching the text
+            if isinstance(store, SqliteStreakStore):
+                store._mutated(1, 2)
+            else:
+                store.mark_dirty()
+            return counting_render(renders, "summary")(profile)
+
+        await cache.get("summary", 1, 2, render_during_a_write)
+        await cache.get("summary", 1, 2, counting_render(renders, "summary"))
+        await cache.get("summary", 1, 2, counting_render(renders, "summary"))
+        return renders, cache.hits
+
+    renders, hits = asyncio.run(scenario())
+    assert renders == {"summary": 2}
+    assert hits == 1
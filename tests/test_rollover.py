@@ -0,0 +1,124 @@
+import asyncio
+import random
+
+import analytics
+import rollover
+
+
+def batch_for(freeze, streaks):
+    """One profile with ``streaks`` as (name, daily, aim) rows."""
+    return rollover.collect([(1, 2, freeze)], [(1, 2, name, daily, aim) for name, daily, aim in streaks])
+
+
+class NeverEarn:
+    def randint(self, low, high):
+        return high
+
+
+def test_freeze_covers_all_misses():
+    batch = batch_for(2, [("run", 3, 3), ("read", 1, 2), ("piano", 0, 1)])
+    result = rollover.roll_over(batch, NeverEarn())
+    report = result.reports[0]
+    assert result.daily == [3, 1, 0]
+    assert result.aim == [4, 2, 1]
+    assert report.completed == ["run"]
+    assert report.reset == []
+    assert (report.missed, report.freeze_spent, report.freeze) == (2, 2, 0)
+    assert not report.extinguished
+
+
+def test_freeze_too_small_resets_missed_streaks():
+    batch = batch_for(1, [("run", 3, 3), ("read", 1, 2), ("piano", 0, 1)])
+    result = rollover.roll_over(batch, NeverEarn())
+    report = result.reports[0]
+    assert result.daily == [3, 0, 0]
+    assert result.aim == [4, 1, 1]
+    assert report.reset == ["read", "piano"]
+    assert (report.freeze_spent, report.freeze) == (0, 1)
+    assert not report.extinguished
+
+
+def test_missing_every_streak_extinguishes():
+    batch = batch_for(0, [("run", 2, 3), ("read", 0, 1)])
+    report = rollover.roll_over(batch, NeverEarn()).reports[0]
+    assert report.extinguished
+    assert report.reset == ["run", "read"]
+
+
+def test_weekly_streaks_never_spend_or_earn_freezes():
+    batch = batch_for(5, [("hike", 0, 1), ("call", 1, 1)])
+    result = rollover.roll_over(batch, random.Random(0), freezes=False)
+    report = result.reports[0]
+    assert report.reset == ["hike"]
+    assert (report.freeze_spent, report.freeze_earned, report.freeze) == (0, 0, 5)
+
+
+def test_clean_day_earns_freeze_by_seeded_chance():
+    owners = [(1, user, 0) for user in range(200)]
+    streaks = [(1, user, "run", 1, 1) for user in range(200)]
+    result = rollover.roll_over(rollover.collect(owners, streaks), random.Random(42))
+    expected_rng = random.Random(42)
+    expected = [1 if expected_rng.randint(0, 100) < rollover.FREEZE_EARN_CHANCE else 0 for _ in owners]
+    assert [report.freeze_earned for report in result.reports] == expected
+    assert result.freeze == expected
+    assert 0 < sum(expected) < len(owners)
+
+
+def test_missed_day_never_earns_freeze():
+    class AlwaysEarn:
+        def randint(self, low, high):
+            return low
+
+    report = rollover.roll_over(batch_for(0, [("run", 1, 1), ("read", 0, 1)]), AlwaysEarn()).reports[0]
+    assert report.freeze_earned == 0
+
+
+def test_profile_without_streaks_is_left_alone():
+    class AlwaysEarn:
+        def randint(self, low, high):
+            return low
+
+    batch = rollover.collect([(1, 2, 3), (1, 3, 0)], [(1, 3, "run", 1, 1)])
+    result = rollover.roll_over(batch, AlwaysEarn())
+    assert [(report.guild_id, report.user_id) for report in result.reports] == [(1, 3)]
+    assert result.freeze == [3, 1]
+
+
+def test_sqlite_rollover_matches_the_engine(tmp_path):
+    from sqlite_store import SqliteStreakStore
+
+    # Names in key order, the order SQLite hands them back in
+    streaks = {
+        1: [("read", 1, 2), ("run", 3, 3)],  # one miss, covered by a freeze
+        2: [("read", 0, 1), ("run", 5, 5)],  # one miss, no freeze left
+        3: [("read", 2, 3), ("run", 0, 1)],  # everything missed
+        4: [("run", 7, 7)],                  # clean day
+        5: [],                               # nothing tracked
+    }
+    freeze = {1: 2, 2: 0, 3: 0, 4: 1, 5: 4}
+    history = {"history": 0b1000001, "longest": 6, "done-7": 2, "done-30": 2, "done-365": 2, "days": 40}
+    batch = rollover.collect(
+        [(1, user, freeze[user]) for user in streaks],
+        [(1, user, name, daily, aim, analytics.stats_of(history))
+         for user, rows in streaks.items() for name, daily, aim in rows])
+    expected = rollover.roll_over(batch, NeverEarn())
+
+    async def scenario():
+        store = SqliteStreakStore(str(tmp_path / "streaks.db"))
+        store.load()
+        for user, rows in streaks.items():
+            await store._run(store._write, store._put_profile, 1, user, {
+                "freeze": freeze[user],
+                "daily-streaks": {name: {"daily": daily, "aim": aim, **history} for name, daily, aim in rows}})
+        result = await store.roll_over(NeverEarn(), period="2024-05-21")
+        profiles = {user: await store.profile(1, user) for user in streaks}
+        store.save()
+        return result, profiles
+
+    result, profiles = asyncio.run(scenario())
+    assert result.reports == expected.reports
+    for i, (owner, name) in enumerate(zip(batch.owner, batch.names)):
+        details = profiles[batch.owners[owner][1]]["daily-streaks"][name]
+        assert (details["daily"], details["aim"]) == (expected.daily[i], expected.aim[i])
+        assert analytics.stats_of(details) == expected.stats[i]
+    assert [profiles[user]["freeze"] for _, user in batch.owners] == expected.freeze
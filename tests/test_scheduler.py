@@ -0,0 +1,167 @@
+import asyncio
+import datetime
+import json
+import random
+
+import pytz
+
+import scheduler as scheduler_module
+from scheduler import Recurrence, Scheduler
+from sqlite_store import SqliteStreakStore
+from store import StreakStore, DEFAULT_TIMEZONE
+
+UTC = pytz.utc
+
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=UTC)
+
+
+def test_next_after_keeps_local_time_across_spring_forward():
+    recurrence = Recurrence("America/New_York", 7, 47)
+    # 08:00 EST on the day before clocks go forward
+    assert recurrence.next_after(utc(2024, 3, 9, 13, 0)) == utc(2024, 3, 10, 11, 47)
+
+
+def test_next_after_keeps_local_time_across_fall_back():
+    recurrence = Recurrence("America/New_York", 7, 47)
+    assert recurrence.next_after(utc(2024, 11, 2, 12, 0)) == utc(2024, 11, 3, 12, 47)
+
+
+def test_next_after_moves_a_skipped_local_time_forward():
+    # 02:30 does not exist on the spring-forward day, it becomes 03:30 EDT
+    recurrence = Recurrence("America/New_York", 2, 30)
+    assert recurrence.next_after(utc(2024, 3, 10, 5, 0)) == utc(2024, 3, 10, 7, 30)
+
+
+def test_next_after_weekly_finds_the_weekday():
+    recurrence = Recurrence("Europe/Paris", 7, 47, weekday=0)
+    # Wednesday 2024-05-15 -> Monday 2024-05-20, 07:47 CEST
+    assert recurrence.next_after(utc(2024, 5, 15, 12, 0)) == utc(2024, 5, 20, 5, 47)
+
+
+def test_stale_last_run_catches_up_once():
+    async def scenario():
+        now = datetime.datetime.now(UTC)
+        recurrence = Recurrence("UTC", now.hour, now.minute)
+        runs = []
+
+        async def job(due):
+            runs.append(due)
+
+        scheduler = Scheduler({"job": (now - datetime.timedelta(days=3)).isoformat()})
+        scheduler.add("job", recurrence, job)
+        assert scheduler.next_due() <= now
+        task = asyncio.create_task(scheduler.run())
+        for _ in range(100):
+            if runs:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return runs, scheduler.next_due(), now
+
+    runs, next_due, now = asyncio.run(scenario())
+    assert len(runs) == 1
+    assert next_due > now
+
+
+def test_failed_job_is_retried_for_the_same_occurrence(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "RETRY_DELAY", datetime.timedelta(milliseconds=10))
+
+    async def scenario():
+        now = datetime.datetime.now(UTC)
+        recurrence = Recurrence("UTC", now.hour, now.minute)
+        attempts = []
+        recorded = []
+
+        async def job(due):
+            attempts.append(due)
+            if len(attempts) < 3:
+                raise RuntimeError("flaky")
+
+        async def on_run(key, when):
+            recorded.append(key)
+            raise OSError("disk full")
+
+        scheduler = Scheduler({"job": (now - datetime.timedelta(days=3)).isoformat()}, on_run=on_run)
+        scheduler.add("job", recurrence, job)
+        task = asyncio.create_task(scheduler.run())
+        for _ in range(100):
+            if recorded:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        alive = not task.done()
+        task.cancel()
+        return attempts, recorded, alive, scheduler.next_due(), now
+
+    attempts, recorded, alive, next_due, now = asyncio.run(scenario())
+    assert len(attempts) == 3 and len(set(attempts)) == 1
+    assert recorded == ["job"]
+    assert alive and next_due > now
+
+
+def test_catch_up_starts_a_new_job_at_its_latest_occurrence():
+    now = datetime.datetime.now(UTC)
+    recurrence = Recurrence("UTC", 0, 0)
+    scheduler = Scheduler()
+    scheduler.add("late", recurrence, None, catch_up=True)
+    scheduler.add("on-time", recurrence, None)
+    due = sorted(entry[0] for entry in scheduler._heap)
+    assert due[0] <= now < due[1]
+
+
+def test_json_store_closes_a_period_once(tmp_path):
+    path = tmp_path / "streaks.json"
+    path.write_text(json.dumps({"daily-streaks": {}, "weekly-streaks": {}, "master-count": 0, "freeze": 0}))
+
+    async def scenario():
+        store = StreakStore(str(path), flush_delay=0)
+        store.load()
+        await store.add_many(0, 0, ["run"])
+        await store.done_many(0, 0, ["run"])
+        when = utc(2024, 5, 20, 11, 47)
+        first = await store.roll_over(random.Random(0), period="2024-05-20", job="rollover:x", when=when)
+        second = await store.roll_over(random.Random(0), period="2024-05-20", job="rollover:x", when=when)
+        return store, first, second
+
+    store, first, second = asyncio.run(scenario())
+    assert first.reports[0].completed == ["run"]
+    assert second.reports == []
+    run = store.data["daily-streaks"]["run"]
+    assert (run["daily"], run["aim"]) == (1, 2)
+    assert store.data["schedule"]["rollover:x"] == "2024-05-20T11:47:00+00:00"
+
+
+def test_sqlite_store_closes_a_period_once_with_its_schedule_row(tmp_path):
+    async def scenario():
+        store = SqliteStreakStore(str(tmp_path / "streaks.db"))
+        store.load()
+        try:
+            await store.add_many(1, 2, ["run"])
+            await store.done_many(1, 2, ["run"])
+            when = utc(2024, 5, 20, 11, 47)
+            first = await store.roll_over(random.Random(0), period="2024-05-20", job="rollover:x", when=when)
+            second = await store.roll_over(random.Random(0), period="2024-05-20", job="rollover:x", when=when)
+            return first, second, await store.profile(1, 2), await store.last_runs()
+        finally:
+            store.save()
+
+    first, second, profile, last_runs = asyncio.run(scenario())
+    assert first.reports[0].completed == ["run"]
+    assert second.reports == []
+    assert (profile["daily-streaks"]["run"]["daily"], profile["daily-streaks"]["run"]["aim"]) == (1, 2)
+    assert last_runs == {"rollover:x": "2024-05-20T11:47:00+00:00"}
+
+
+def test_sqlite_store_always_schedules_the_default_zone(tmp_path):
+    async def scenario():
+        store = SqliteStreakStore(str(tmp_path / "streaks.db"))
+        store.load()
+        await store.set_timezone(1, 2, "Europe/Paris")
+        timezones = await store.timezones()
+        store.save()
+        return timezones
+
+    assert asyncio.run(scenario()) == sorted({DEFAULT_TIMEZONE, "Europe/Paris"})
@@ -0,0 +1,67 @@
+import asyncio
+
+from store import StreakStore, DONE_ALREADY, DONE_MISSING, DONE_UPDATED
+
+GUILD, USER = 1, 2
+
+
+def transactions(store):
+    # Journal lines for the JSON store, committed transactions for SQLite
+    return store.journal.seq if isinstance(store, StreakStore) else store.writes
+
+
+async def streaks(store):
+    return (await store.profile(GUILD, USER))["daily-streaks"]
+
+
+def test_done_many_reports_each_name(store):
+    async def scenario():
+        await store.add_many(GUILD, USER, ["run", "read", "write"])
+        await store.done_many(GUILD, USER, ["run"])
+        results = await store.done_many(GUILD, USER, ["run", "read", "write"])
+        return results, {name: details["daily"] for name, details in (await streaks(store)).items()}
+
+    results, daily = asyncio.run(scenario())
+    assert results == {"run": DONE_ALREADY, "read": DONE_UPDATED, "write": DONE_UPDATED}
+    assert daily == {"run": 1, "read": 1, "write": 1}
+
+
+def test_done_many_applies_nothing_when_a_name_is_missing(store):
+    async def scenario():
+        await store.add_many(GUILD, USER, ["run", "read"])
+        results = await store.done_many(GUILD, USER, ["run", "swim", "read"])
+        return results, {name: details["daily"] for name, details in (await streaks(store)).items()}
+
+    results, daily = asyncio.run(scenario())
+    assert results == {"run": DONE_UPDATED, "swim": DONE_MISSING, "read": DONE_UPDATED}
+    assert daily == {"run": 0, "read": 0}
+
+
+def test_remove_many_is_all_or_nothing(store):
+    async def scenario():
+        await store.add_many(GUILD, USER, ["run", "read", "write"])
+        refused = await store.remove_many(GUILD, USER, ["run", "swim"])
+        kept = sorted(await streaks(store))
+        removed = await store.remove_many(GUILD, USER, ["run", "read"])
+        return refused, kept, removed, sorted(await streaks(store))
+
+    refused, kept, removed, left = asyncio.run(scenario())
+    assert refused == {"run": True, "swim": False}
+    assert kept == ["read", "run", "write"]
+    assert removed == {"run": True, "read": True}
+    assert left == ["write"]
+
+
+def test_each_batch_is_one_journal_line_or_transaction(store):
+    async def scenario():
+        counts = [transactions(store)]
+        await store.add_many(GUILD, USER, ["run", "read", "write"])
+        counts.append(transactions(store))
+        await store.done_many(GUILD, USER, ["run", "read", "write"])
+        counts.append(transactions(store))
+        await store.remove_many(GUILD, USER, ["run", "read"])
+        counts.append(transactions(store))
+        return counts
+
+    counts = asyncio.run(scenario())
+    assert [after - before for before, after in zip(counts, counts[1:])] == [1, 1, 1]